@@ -1,12 +1,115 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-import pandas as pd
-import joblib
+import hashlib
+import hmac
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
 
-# Load the full pipeline (preprocessor + LightGBM)
-model = joblib.load("model/used_car_lgbm_pipeline.pkl")
+from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response
+from pydantic import BaseModel, Field, ValidationError
 
-app = FastAPI(title="Used Car Price Model")
+import metrics
+from cache import PredictionCache
+from inference import CompiledPipeline
+from metrics import StageTimer
+from registry import ModelRegistry, ModelVersion, source_files
+
+# pandas, joblib and sklearn are only imported when a pickled pipeline is
+# used (or for /features), so serving from the exported artifact starts fast
+
+MODEL_PATH = "model/used_car_lgbm_pipeline.pkl"
+
+# Artifact written by export.py, used instead of the pickle when it was exported from it
+ARTIFACT_DIR = os.environ.get("ML_MODEL_ARTIFACT", "model/artifact")
+
+# Name of the version loaded at startup
+MODEL_VERSION = os.environ.get("ML_MODEL_VERSION", "default")
+
+# LightGBM threads per prediction, 0 lets LightGBM use all cores
+NUM_THREADS = int(os.environ.get("ML_NUM_THREADS", "0"))
+
+FAST_PATH = os.environ.get("ML_FAST_PATH", "1") != "0"
+
+# Seconds between checks for changed model files, 0 disables hot reload
+RELOAD_INTERVAL = float(os.environ.get("ML_RELOAD_INTERVAL", "2"))
+
+# Optional JSON file the registry state is shared through (needed with serve.py workers)
+REGISTRY_STATE = os.environ.get("ML_REGISTRY_STATE") or None
+
+# Required in the X-Admin-Token header of the /models and /debug admin endpoints;
+# without it those endpoints are disabled (403)
+ADMIN_TOKEN = os.environ.get("ML_ADMIN_TOKEN", "")
+
+# POST /models only loads from inside these: a pickle load runs arbitrary code
+MODEL_ROOTS = [os.path.realpath(os.path.dirname(MODEL_PATH)), os.path.realpath(ARTIFACT_DIR)]
+
+# Start the sampling profiler at startup (it can also be switched on at runtime)
+PROFILER = os.environ.get("ML_PROFILER", "0") != "0"
+
+
+def artifact_is_current() -> bool:
+    if not CompiledPipeline.is_artifact(ARTIFACT_DIR):
+        return False
+    if not os.path.exists(MODEL_PATH):
+        return True
+    with open(MODEL_PATH, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    if CompiledPipeline.artifact_metadata(ARTIFACT_DIR).get("source_sha256") == digest:
+        return True
+    print(f"WARNING: {ARTIFACT_DIR} was not exported from {MODEL_PATH}, run export.py again. Using the pickle")
+    return False
+
+
+registry = ModelRegistry(
+    fast_path=FAST_PATH,
+    num_threads=NUM_THREADS,
+    state_path=REGISTRY_STATE,
+    check_interval=RELOAD_INTERVAL,
+)
+
+def default_model_path() -> str:
+    # LightGBM text model + encoder tables when available, the sklearn pipeline is then never loaded
+    return ARTIFACT_DIR if FAST_PATH and artifact_is_current() else MODEL_PATH
+
+
+# Watches both the pickle and the artifact, whichever is served: a retrained
+# pickle makes the artifact stale and the reload switches to the pickle like
+# a restart would, and back once export.py has run
+registry.load(
+    MODEL_VERSION,
+    default_model_path(),
+    persist=False,
+    watch=source_files(MODEL_PATH) + source_files(ARTIFACT_DIR),
+    resolve=default_model_path,
+)
+
+# Pick up versions loaded by other workers / an earlier run
+registry.check()
+
+
+def set_num_threads(num_threads: int) -> None:
+    registry.set_num_threads(num_threads)
+
+
+# Upper bound on rows accepted by /predict/batch in a single request
+MAX_BATCH_SIZE = int(os.environ.get("ML_MAX_BATCH_SIZE", "10000"))
+
+# Prediction cache for /predict, ML_CACHE_SIZE=0 disables it
+CACHE_SIZE = int(os.environ.get("ML_CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.environ.get("ML_CACHE_TTL", "0"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Started here and not at import: runs in every serve.py worker after fork
+    registry.start_watching()
+    if PROFILER:
+        metrics.PROFILER.start()
+    yield
+
+
+app = FastAPI(title="Used Car Price Model", lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Input schema
 class CarFeatures(BaseModel):
@@ -38,16 +141,377 @@ class CarFeatures(BaseModel):
     model_full: str
 
 
+# Raw listing as stored on the Car table (Danish units, DB lookup ids)
+class RawListing(BaseModel):
+    # Required: without them there is no car to price, only a current-year
+    # "other" car the features would default to, so the row gets an error
+    make: str = Field(min_length=1)
+    name: str = Field(min_length=1)
+    model_year: int
+    mileage: Optional[float] = None  # km
+    fuel_consumption: Optional[str] = None  # e.g. "(WLTP) 16,1 km/l"
+    power: Optional[str] = None  # e.g. "115 hk/190 nm"
+    engine_displacement: Optional[str] = None
+    transmission_type_id: Optional[int] = None
+    drivetrain_id: Optional[int] = None
+    fuel_type: Optional[str] = None
+    color: Optional[str] = None
+    number_of_owners: Optional[int] = None
+
+
+# Keys are prefixed with the model's content digest, so a reload or version
+# switch never serves another model's predictions
+cache = (
+    PredictionCache(CarFeatures.__fields__, maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+    if CACHE_SIZE > 0
+    else None
+)
+
+
 class PredictionResponse(BaseModel):
     predicted_price: float
+    # Price band from the model's quantile boosters, when it has them
+    price_low: Optional[float] = None
+    price_high: Optional[float] = None
+    interval_quantiles: Optional[List[float]] = None
+    model_version: Optional[str] = None
+
+
+class BatchPredictionItem(BaseModel):
+    # Exactly one of predicted_price and error is set for every input row
+    predicted_price: Optional[float] = None
+    price_low: Optional[float] = None
+    price_high: Optional[float] = None
+    error: Optional[str] = None
+
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[BatchPredictionItem]
+    interval_quantiles: Optional[List[float]] = None
+    model_version: Optional[str] = None
+
+
+class ListingPredictionItem(BatchPredictionItem):
+    # Engineered features the prediction was made from
+    features: Optional[CarFeatures] = None
+
+
+class ListingPredictionResponse(BaseModel):
+    predictions: List[ListingPredictionItem]
+    interval_quantiles: Optional[List[float]] = None
+    model_version: Optional[str] = None
+
+
+class LoadModelRequest(BaseModel):
+    version: str
+    path: str  # export.py artifact dir or pickled pipeline, relative to ml-service/
+    activate: bool = False
+
+
+class VersionRequest(BaseModel):
+    version: Optional[str] = None
+
+
+def format_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+        for err in e.errors()
+    )
+
+
+def resolve_version(version: Optional[str]) -> ModelVersion:
+    try:
+        return registry.get(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+
+
+def shadow_score(primary: ModelVersion, pinned: Optional[str], rows: List[dict], preds, tasks: BackgroundTasks) -> None:
+    # Runs the shadow model after the response is sent, pinned requests are not shadowed
+    shadow = registry.shadow()
+    if shadow is None or pinned is not None or shadow is primary or not rows:
+        return
+
+    def run() -> None:
+        timer = StageTimer("shadow", shadow.name)
+        registry.record_shadow(shadow.name, preds, shadow.predict_many(rows, list(CarFeatures.__fields__), timer))
+        metrics.SHADOW_PREDICTIONS.inc(shadow.name, amount=len(rows))
+
+    tasks.add_task(run)
+
+
+def request_timer(request: Request, model: ModelVersion) -> StageTimer:
+    timer = StageTimer(request.scope["route"].path, model.name)
+    started = request.scope.get("state", {}).get("started")
+    if started is not None:
+        # Body parsing, pydantic validation and the hop to the threadpool, before the handler ran
+        timer.observe("validate", time.perf_counter() - started)
+    return timer
+
+
+def interval_quantiles(model: ModelVersion, interval: bool) -> Optional[List[float]]:
+    return model.interval_quantiles if interval else None
+
+
+def predict_many(model: ModelVersion, rows: List[dict], timer: StageTimer, interval: bool):
+    # Point predictions plus, if requested and available, the band from the same encoding pass
+    if interval_quantiles(model, interval):
+        return model.predict_many_interval(rows, list(CarFeatures.__fields__), timer)
+    return model.predict_many(rows, list(CarFeatures.__fields__), timer), None, None
 
 
 @app.post("/predict", response_model=PredictionResponse)
-def predict(car: CarFeatures):
-    # Convert to DataFrame with a single row
-    data = pd.DataFrame([car.dict()])
+def predict(
+    car: CarFeatures,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    version: Optional[str] = None,
+    interval: bool = True,
+):
+    model = resolve_version(version)
+    timer = request_timer(request, model)
+    features = car.dict()
+    quantiles = interval_quantiles(model, interval)
+
+    key = None
+    result = None
+    if cache is not None:
+        with timer.time("cache"):
+            key = (model.digest, quantiles is not None) + cache.key(features)
+            result = cache.get(key)
+        metrics.CACHE_LOOKUPS.inc(model.name, "miss" if result is None else "hit")
+
+    if result is None:
+        if quantiles:
+            result = model.predict_one_interval(features, timer)
+        else:
+            result = (model.predict_one(features, timer), None, None)
+        if key is not None:
+            cache.put(key, result)
+
+    pred, low, high = result
+    metrics.PREDICTIONS.inc(timer.route, model.name)
+    shadow_score(model, version, [features], [pred], background_tasks)
+    return PredictionResponse(
+        predicted_price=pred,
+        price_low=low,
+        price_high=high,
+        interval_quantiles=quantiles,
+        model_version=model.name,
+    )
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+def check_batch_size(n: int) -> None:
+    if n > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {n} rows exceeds the limit of {MAX_BATCH_SIZE}",
+        )
+
+
+def validate_rows(rows: List[Dict[str, Any]], schema, items) -> Tuple[List[int], List[dict]]:
+    # Validate rows one by one so a bad row only fails its own slot
+    valid_idx: list[int] = []
+    valid_rows: list[dict] = []
+    for i, raw in enumerate(rows):
+        try:
+            valid_rows.append(schema(**raw).dict())
+            valid_idx.append(i)
+        except ValidationError as e:
+            items[i].error = format_validation_error(e)
+    return valid_idx, valid_rows
+
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+def predict_batch(
+    cars: List[Dict[str, Any]],
+    request: Request,
+    background_tasks: BackgroundTasks,
+    version: Optional[str] = None,
+    interval: bool = True,
+):
+    check_batch_size(len(cars))
+    model = resolve_version(version)
+    timer = request_timer(request, model)
+    metrics.BATCH_ROWS.observe(len(cars), timer.route)
+
+    items = [BatchPredictionItem() for _ in cars]
+    with timer.time("validate_rows"):
+        valid_idx, valid_rows = validate_rows(cars, CarFeatures, items)
+
+    if valid_rows:
+        preds, low, high = predict_many(model, valid_rows, timer, interval)
+        metrics.PREDICTIONS.inc(timer.route, model.name, amount=len(valid_rows))
+        for n, i in enumerate(valid_idx):
+            items[i].predicted_price = float(preds[n])
+            if low is not None:
+                items[i].price_low = float(low[n])
+                items[i].price_high = float(high[n])
+        shadow_score(model, version, valid_rows, preds, background_tasks)
+
+    return BatchPredictionResponse(
+        predictions=items, interval_quantiles=interval_quantiles(model, interval), model_version=model.name
+    )
+
+
+def listings_to_features(listings: List[dict]) -> List[dict]:
+    import pandas as pd
+    from features import engineer_features
+
+    frame = pd.DataFrame.from_records(listings, columns=list(RawListing.__fields__))
+    return engineer_features(frame).to_dict("records")
+
+
+@app.post("/features", response_model=List[CarFeatures])
+def features(listings: List[RawListing]):
+    check_batch_size(len(listings))
+    return listings_to_features([listing.dict() for listing in listings])
+
+
+@app.post("/predict/listings", response_model=ListingPredictionResponse)
+def predict_listings(
+    listings: List[Dict[str, Any]],
+    request: Request,
+    background_tasks: BackgroundTasks,
+    version: Optional[str] = None,
+    interval: bool = True,
+):
+    check_batch_size(len(listings))
+    model = resolve_version(version)
+    timer = request_timer(request, model)
+    metrics.BATCH_ROWS.observe(len(listings), timer.route)
+
+    items = [ListingPredictionItem() for _ in listings]
+    with timer.time("validate_rows"):
+        valid_idx, valid_rows = validate_rows(listings, RawListing, items)
+
+    if valid_rows:
+        with timer.time("features"):
+            rows = listings_to_features(valid_rows)
+        preds, low, high = predict_many(model, rows, timer, interval)
+        metrics.PREDICTIONS.inc(timer.route, model.name, amount=len(rows))
+        for n, (i, row) in enumerate(zip(valid_idx, rows)):
+            items[i].features = CarFeatures(**row)
+            items[i].predicted_price = float(preds[n])
+            if low is not None:
+                items[i].price_low = float(low[n])
+                items[i].price_high = float(high[n])
+        shadow_score(model, version, rows, preds, background_tasks)
+
+    return ListingPredictionResponse(
+        predictions=items, interval_quantiles=interval_quantiles(model, interval), model_version=model.name
+    )
+
+
+def check_admin_token(x_admin_token: str = Header(default="")) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set ML_ADMIN_TOKEN")
+    if not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def model_path_allowed(path: str) -> bool:
+    real = os.path.realpath(path)
+    return any(real == root or real.startswith(root + os.sep) for root in MODEL_ROOTS)
+
+
+def model_info() -> Dict[Tuple[str, ...], float]:
+    state = registry.describe()
+    return {
+        (v["version"], v["digest"], str(v["version"] == state["active"]).lower(), str(v["version"] == state["shadow"]).lower()): 1
+        for v in state["versions"]
+    }
+
+
+def cache_info() -> Dict[Tuple[str, ...], float]:
+    if cache is None:
+        return {}
+    stats = cache.stats()
+    return {(name,): stats[name] for name in ("size", "maxsize", "evictions", "expirations")}
+
+
+metrics.REGISTRY.add(metrics.Gauge(
+    "ml_model_info", "Loaded model versions (value is always 1)", ("version", "digest", "active", "shadow"), model_info
+))
+metrics.REGISTRY.add(metrics.Gauge("ml_cache", "Prediction cache size and eviction counts", ("stat",), cache_info))
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+class ProfilerRequest(BaseModel):
+    enabled: bool
+    interval_ms: float = 5.0
+
+
+@app.post("/debug/profiler", dependencies=[Depends(check_admin_token)])
+def toggle_profiler(request: ProfilerRequest):
+    if request.enabled:
+        metrics.PROFILER.start(interval=max(request.interval_ms, 0.1) / 1000)
+    else:
+        metrics.PROFILER.stop()
+    return metrics.PROFILER.status()
+
+
+@app.get("/debug/profiler", dependencies=[Depends(check_admin_token)], response_class=PlainTextResponse)
+def profiler_stacks(limit: int = 0):
+    # Folded stacks, most sampled first; pipe into flamegraph.pl or load in speedscope
+    return metrics.PROFILER.folded(limit)
+
+
+@app.get("/models")
+def list_models():
+    return registry.describe()
+
+
+@app.post("/models", dependencies=[Depends(check_admin_token)])
+def load_model(request: LoadModelRequest):
+    # Blocks this request while loading, predictions keep being served meanwhile
+    if not model_path_allowed(request.path):
+        raise HTTPException(status_code=403, detail=f"Model path outside {', '.join(MODEL_ROOTS)}: {request.path}")
+    if not os.path.exists(request.path):
+        raise HTTPException(status_code=404, detail=f"Model path not found: {request.path}")
+    try:
+        registry.load(request.version, request.path, activate=request.activate)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Could not load {request.path}: {e}")
+    return registry.describe()
+
+
+@app.post("/models/active", dependencies=[Depends(check_admin_token)])
+def activate_model(request: VersionRequest):
+    try:
+        registry.activate(request.version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {request.version}")
+    return registry.describe()
+
+
+@app.post("/models/shadow", dependencies=[Depends(check_admin_token)])
+def shadow_model(request: VersionRequest):
+    # version null turns shadow scoring off
+    try:
+        registry.set_shadow(request.version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {request.version}")
+    return registry.describe()
 
-    # Run through pipeline (preprocessing + LightGBM)
-    pred = model.predict(data)[0]
 
-    return PredictionResponse(predicted_price=float(pred))
+@app.delete("/models/{version}", dependencies=[Depends(check_admin_token)])
+def unload_model(version: str):
+    try:
+        registry.unload(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return registry.describe()
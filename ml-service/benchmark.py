@@ -0,0 +1,406 @@
+"""Latency / throughput benchmark for the prediction endpoints.
+
+    python benchmark.py                          # app in-process (TestClient)
+    python benchmark.py --server uvicorn         # spawns `uvicorn app:app` on a free port
+    python benchmark.py --url http://host:8000   # an already running service
+
+Payloads are synthetic CarFeatures drawn from the category vocabularies in
+client/src/db/model_input_db.json. Runs the single, batch and concurrent
+scenarios and writes the results (with the git commit) as JSON, so runs
+from different commits can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from preprocessing import VARIANTS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+VOCAB_PATH = os.path.join(HERE, "..", "client", "src", "db", "model_input_db.json")
+
+# Same reference year the training notebook used for car_age
+REFERENCE_YEAR = 2023
+
+
+def make_payloads(n: int, seed: int) -> List[Dict[str, Any]]:
+    with open(VOCAB_PATH, "r", encoding="utf-8") as f:
+        vocab = json.load(f)
+    rng = random.Random(seed)
+    variants = VARIANTS + ["other"]
+
+    payloads = []
+    for _ in range(n):
+        year = rng.randint(2000, REFERENCE_YEAR)
+        model = rng.choice(vocab["model"])
+        engine = float(rng.choice(vocab["engine_size_l"]))
+        drivetrain = rng.choice(vocab["drivetrain"])
+        payloads.append({
+            "year": year,
+            "mileage": float(rng.randint(0, 200_000)),
+            "mpg_avg": round(rng.uniform(15, 45), 1),
+            "engine_size_l": engine,
+            "hp": float(rng.randint(90, 500)),
+            "car_age": float(REFERENCE_YEAR - year),
+            "manufacturer": rng.choice(vocab["manufacturer"]),
+            "model": model,
+            "transmission": rng.choice(vocab["transmission"]),
+            "drivetrain": drivetrain,
+            "fuel_type": rng.choice(vocab["fuel_type"]),
+            "exterior_color": rng.choice(vocab["exterior_color"]),
+            "accidents_or_damage": rng.randint(0, 1),
+            "one_owner": rng.randint(0, 1),
+            "personal_use_only": rng.randint(0, 1),
+            "model_variant": rng.choice(variants),
+            "model_engine": f"{model}_{engine}",
+            "model_drivetrain": f"{model}_{drivetrain}",
+            "model_full": f"{model}_{engine}_{drivetrain}",
+        })
+    return payloads
+
+
+def _proc_kb(path: str, field: str) -> Optional[int]:
+    # "<field>: <n> kB" line of a /proc file (Linux), None where it isn't available
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def child_pids(pid: int) -> List[int]:
+    # All descendants, e.g. the forked serve.py workers
+    parents: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r", encoding="utf-8") as f:
+                # The command name is in parentheses and may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+    found, todo = [], [pid]
+    while todo:
+        children = parents.get(todo.pop(), [])
+        found.extend(children)
+        todo.extend(children)
+    return sorted(found)
+
+
+def memory_mb(pid: Optional[int]) -> Optional[Dict[str, Any]]:
+    """RSS of the server process and RSS/PSS of it and its workers, in MB.
+
+    PSS splits shared pages between the processes sharing them, so
+    total_pss_mb shows what the copy-on-write model memory really costs;
+    summed RSS counts it once per worker.
+    """
+    if pid is None:
+        return None
+    rss = _proc_kb(f"/proc/{pid}/status", "VmRSS")
+    if rss is None:
+        return None
+
+    def mb(kb: Optional[int]) -> Optional[float]:
+        return round(kb / 1024, 1) if kb is not None else None
+
+    workers = child_pids(pid)
+    workers_rss = [_proc_kb(f"/proc/{w}/status", "VmRSS") for w in workers]
+    pss = [_proc_kb(f"/proc/{p}/smaps_rollup", "Pss") for p in [pid, *workers]]
+    has_pss = all(v is not None for v in pss)
+    return {
+        "rss_mb": mb(rss),
+        "pss_mb": mb(pss[0]),
+        "workers": len(workers),
+        "workers_rss_mb": mb(sum(v or 0 for v in workers_rss)),
+        "workers_pss_mb": mb(sum(pss[1:])) if has_pss else None,
+        "total_pss_mb": mb(sum(pss)) if has_pss else None,
+    }
+
+
+def git_commit() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--", "."], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Target:
+    """Sends requests to the app and knows which process to measure."""
+
+    def __init__(self, post: Callable[[str, Any], Tuple[int, Any]], pid: Optional[int], close: Callable[[], None]):
+        self.post = post
+        self.pid = pid
+        self.close = close
+
+
+def inprocess_target() -> Target:
+    os.chdir(HERE)
+    sys.path.insert(0, HERE)
+    from fastapi.testclient import TestClient
+
+    import app
+
+    client = TestClient(app.app)
+    client.__enter__()
+
+    def post(path: str, body: Any) -> Tuple[int, Any]:
+        r = client.post(path, json=body)
+        return r.status_code, r.content
+
+    return Target(post, os.getpid(), lambda: client.__exit__(None, None, None))
+
+
+def http_target(url: str, pid: Optional[int] = None, process: Optional[subprocess.Popen] = None) -> Target:
+    import httpx
+
+    # One keep-alive connection per thread, like separate clients would have
+    local = threading.local()
+
+    def post(path: str, body: Any) -> Tuple[int, Any]:
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = httpx.Client(base_url=url, timeout=60)
+        r = client.post(path, json=body)
+        return r.status_code, r.content
+
+    def close() -> None:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    return Target(post, pid, close)
+
+
+def spawn_uvicorn(workers: int) -> Target:
+    import httpx
+
+    port = free_port()
+    cmd = [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"]
+    if workers > 1:
+        cmd = [sys.executable, "serve.py", "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    process = subprocess.Popen(cmd, cwd=HERE)
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while True:
+        try:
+            if httpx.get(url + "/cache/stats", timeout=1).status_code == 200:
+                break
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError(f"uvicorn did not start: {' '.join(cmd)}")
+        time.sleep(0.2)
+
+    return http_target(url, pid=process.pid, process=process)
+
+
+def summarize(
+    name: str, latencies: List[float], rows: int, errors: int, elapsed: float, memory: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    ms = np.asarray(latencies) * 1000
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "rows": rows,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "requests_per_s": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "rows_per_s": round(rows / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(float(ms.mean()), 4),
+            "p50": round(float(np.percentile(ms, 50)), 4),
+            "p95": round(float(np.percentile(ms, 95)), 4),
+            "p99": round(float(np.percentile(ms, 99)), 4),
+            "max": round(float(ms.max()), 4),
+        },
+        # Server (parent) process only, kept for comparing with older results
+        "rss_mb": memory["rss_mb"] if memory else None,
+        "memory_mb": memory,
+    }
+
+
+def timed_post(target: Target, path: str, body: Any) -> Tuple[float, bool]:
+    started = time.perf_counter()
+    status, _ = target.post(path, body)
+    return time.perf_counter() - started, status == 200
+
+
+def run_sequential(target: Target, name: str, path: str, bodies: List[Any], rows_per_body: int) -> Dict[str, Any]:
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for body in bodies:
+        latency, ok = timed_post(target, path, body)
+        latencies.append(latency)
+        errors += not ok
+    elapsed = time.perf_counter() - started
+    return summarize(name, latencies, len(bodies) * rows_per_body, errors, elapsed, memory_mb(target.pid))
+
+
+def run_concurrent(target: Target, name: str, bodies: List[Any], concurrency: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda body: timed_post(target, "/predict", body), bodies))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for latency, _ in results]
+    errors = sum(not ok for _, ok in results)
+    return summarize(name, latencies, len(bodies), errors, elapsed, memory_mb(target.pid))
+
+
+def workers_memory(memory: Optional[Dict[str, Any]]) -> str:
+    if not memory or not memory["workers"]:
+        return ""
+    pss = f", pss total {memory['total_pss_mb']} MB" if memory["total_pss_mb"] is not None else ""
+    return f" + {memory['workers']} workers rss {memory['workers_rss_mb']} MB{pss}"
+
+
+def compare(current: Dict[str, Any], baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = {r["scenario"]: r for r in baseline["results"]}
+
+    print(f"\nCompared with {baseline_path} ({(baseline.get('git') or {}).get('commit')}):")
+    for result in current["results"]:
+        old = before.get(result["scenario"])
+        if old is None:
+            continue
+        changes = []
+        for label, new_value, old_value in (
+            ("p50", result["latency_ms"]["p50"], old["latency_ms"]["p50"]),
+            ("p99", result["latency_ms"]["p99"], old["latency_ms"]["p99"]),
+            ("rows/s", result["rows_per_s"], old["rows_per_s"]),
+        ):
+            if old_value:
+                changes.append(f"{label} {(new_value - old_value) / old_value * 100:+.1f}%")
+        print(f"  {result['scenario']:<24} " + ", ".join(changes))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the ml-service prediction endpoints")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--server", choices=["inprocess", "uvicorn"], default="inprocess")
+    target.add_argument("--url", help="Benchmark a running service instead")
+    parser.add_argument("--pid", type=int, help="Server process to read memory from (with its workers), with --url")
+    parser.add_argument("--workers", type=int, default=1, help="With --server uvicorn, >1 starts serve.py")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--batch-sizes", default="10,100,1000")
+    parser.add_argument("--batch-requests", type=int, default=50, help="Requests per batch size")
+    parser.add_argument("--concurrency", default="4,16")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenarios", default="single,batch,concurrent")
+    parser.add_argument("--out", default=os.path.join(HERE, "benchmarks", "latest.json"))
+    parser.add_argument("--compare", help="Earlier result JSON to print the changes against")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    scenarios = set(args.scenarios.split(","))
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b]
+    concurrency = [int(c) for c in args.concurrency.split(",") if c]
+
+    # Distinct payloads per request, so the prediction cache only hits on repeats
+    payloads = make_payloads(max([args.requests, *batch_sizes]), args.seed)
+
+    if args.url:
+        target, server = http_target(args.url.rstrip("/"), pid=args.pid), args.url
+    elif args.server == "uvicorn":
+        target, server = spawn_uvicorn(args.workers), "uvicorn" if args.workers == 1 else f"serve.py x{args.workers}"
+    else:
+        target, server = inprocess_target(), "inprocess"
+
+    results = []
+    try:
+        memory_start = memory_mb(target.pid)
+        # Own seed, so the measured payloads are not already in the prediction cache
+        for body in make_payloads(args.warmup, args.seed - 1):
+            target.post("/predict", body)
+
+        if "single" in scenarios:
+            results.append(run_sequential(target, "single", "/predict", payloads[: args.requests], 1))
+            # Same payloads again, now answered from the prediction cache
+            results.append(run_sequential(target, "single_cached", "/predict", payloads[: args.requests], 1))
+
+        if "batch" in scenarios:
+            rng = random.Random(args.seed)
+            for size in batch_sizes:
+                bodies = [rng.sample(payloads, size) for _ in range(args.batch_requests)]
+                results.append(run_sequential(target, f"batch_{size}", "/predict/batch", bodies, size))
+
+        if "concurrent" in scenarios:
+            for c in concurrency:
+                # Shifted so these payloads are not in the cache from the single scenario
+                bodies = make_payloads(args.requests, args.seed + c)
+                results.append(run_concurrent(target, f"concurrent_{c}", bodies, c))
+    finally:
+        target.close()
+
+    for r in results:
+        lat = r["latency_ms"]
+        print(
+            f"{r['scenario']:<24} {r['requests_per_s']:>9.1f} req/s {r['rows_per_s']:>11.1f} rows/s  "
+            f"p50 {lat['p50']:8.3f} ms  p95 {lat['p95']:8.3f} ms  p99 {lat['p99']:8.3f} ms  "
+            f"errors {r['errors']}  rss {r['rss_mb']} MB{workers_memory(r['memory_mb'])}"
+        )
+
+    import lightgbm
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_commit(),
+        "server": server,
+        "environment": {
+            "python": platform.python_version(),
+            "lightgbm": lightgbm.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            k: v for k, v in vars(args).items() if k not in ("out", "compare")
+        },
+        "rss_start_mb": memory_start["rss_mb"] if memory_start else None,
+        "memory_start_mb": memory_start,
+        "results": results,
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.out}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+
+class PredictionCache:
+    """Thread-safe LRU cache of predictions with an optional TTL.
+
+    Entries are keyed on the canonicalized feature values; callers prefix the
+    key with the model's content digest, so a reloaded model never hits the
+    entries of the one before (they age out of the LRU).
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[str],
+        maxsize: int = 10000,
+        ttl: Optional[float] = None,
+    ):
+        self.fields = tuple(fields)
+        self.maxsize = maxsize
+        self.ttl = ttl or None
+
+        self._entries: "OrderedDict[Tuple, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(self, car: Dict[str, Any]) -> Tuple:
+        # Numbers are compared by value (30 == 30.0) and strings as-is
+        return tuple(
+            float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else v
+            for v in (car[f] for f in self.fields)
+        )
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at = entry
+            if self.ttl is not None and now - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Tuple, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (value, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
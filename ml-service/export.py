@@ -0,0 +1,82 @@
+"""Export the trained sklearn pipeline as a compact model artifact.
+
+    python export.py --model model/used_car_lgbm_pipeline.pkl --out model/artifact
+
+Writes the LightGBM booster as a text model (model.txt) and the one-hot
+encoder as lookup tables (encoder.json). app.py serves from the artifact
+when it exists, without unpickling the pipeline, so the service starts
+without sklearn or joblib. Quantile boosters trained next to the pickle
+(train.py --quantiles) are exported with it. The export is only written if
+the artifact reproduces the pipeline's predictions exactly.
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from inference import CompiledPipeline, find_quantile_files, load_quantile_boosters
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export the pipeline as model.txt + encoder.json")
+    parser.add_argument("--model", default=os.path.join(MODEL_DIR, "used_car_lgbm_pipeline.pkl"))
+    parser.add_argument("--out", default=os.path.join(MODEL_DIR, "artifact"))
+    parser.add_argument("--check-rows", type=int, default=256, help="Rows used to verify the export")
+    return parser.parse_args()
+
+
+def file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def main() -> None:
+    args = parse_args()
+
+    pipeline = joblib.load(args.model)
+    compiled = CompiledPipeline.from_sklearn(pipeline)
+    compiled.quantile_boosters = load_quantile_boosters(find_quantile_files(args.model), compiled.n_features)
+    frame = pd.DataFrame(compiled.sample_records(args.check_rows))
+
+    # Write next to the target and swap it in only once it is verified
+    tmp_dir = args.out.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    # app.py compares source_sha256 with the pickle to detect a stale export
+    metadata = {"source": os.path.basename(args.model), "source_sha256": file_sha256(args.model)}
+    compiled.save_artifact(tmp_dir, metadata=metadata)
+
+    exported = CompiledPipeline.from_artifact(tmp_dir)
+    if not exported.matches(pipeline, frame):
+        shutil.rmtree(tmp_dir)
+        sys.exit("Exported artifact does not reproduce the pipeline's predictions, nothing written")
+    records = compiled.sample_records(args.check_rows)
+    _, expected = compiled.predict_many_interval(records)
+    _, actual = exported.predict_many_interval(records)
+    if expected.keys() != actual.keys() or not all(np.array_equal(expected[q], actual[q]) for q in expected):
+        shutil.rmtree(tmp_dir)
+        sys.exit("Exported quantile boosters do not reproduce their predictions, nothing written")
+
+    old_dir = args.out.rstrip(os.sep) + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(args.out):
+        os.rename(args.out, old_dir)
+    os.rename(tmp_dir, args.out)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    size = sum(os.path.getsize(os.path.join(args.out, name)) for name in os.listdir(args.out))
+    quantiles = ", ".join(f"{q:g}" for q in sorted(compiled.quantile_boosters)) or "none"
+    print(
+        f"Exported {args.model} to {args.out} "
+        f"({size / 1e6:.1f} MB, {compiled.n_features} features, quantiles: {quantiles})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import re
+from datetime import date
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import extract_variant
+
+# Columns the model was trained on, in CarFeatures order
+FEATURE_COLUMNS = [
+    "year", "mileage", "mpg_avg", "engine_size_l", "hp", "car_age",
+    "manufacturer", "model", "transmission", "drivetrain", "fuel_type", "exterior_color",
+    "accidents_or_damage", "one_owner", "personal_use_only",
+    "model_variant", "model_engine", "model_drivetrain", "model_full",
+]
+
+# Raw listing fields (as stored on the Car table) accepted by engineer_features
+LISTING_COLUMNS = [
+    "make", "name", "model_year", "mileage", "fuel_consumption", "power",
+    "engine_displacement", "transmission_type_id", "drivetrain_id", "fuel_type",
+    "color", "number_of_owners",
+]
+
+KM_TO_MILES = 0.621371
+KM_PER_L_TO_MPG = 2.35214
+HK_TO_HP = 0.986
+
+VALID_MANUFACTURERS = {
+    "acura", "audi", "bmw", "buick", "cadillac", "chevrolet", "chrysler", "dodge",
+    "ford", "gmc", "honda", "hyundai", "infiniti", "jaguar", "jeep", "kia",
+    "land rover", "lexus", "lincoln", "mazda", "mercedes-benz", "mitsubishi",
+    "nissan", "porsche", "ram", "subaru", "tesla", "toyota", "volkswagen", "volvo",
+}
+
+VALID_EXTERIOR_COLORS = {
+    "beige", "black", "blue", "brown", "gold", "gray", "green", "orange",
+    "purple", "red", "silver", "white", "yellow",
+}
+
+# Danish to English color mapping
+DANISH_COLORS = {
+    "Beige": "Beige",
+    "Blå": "Blue",
+    "Blåmetal": "Blue metal",
+    "Brun": "Brown",
+    "Brunmetal": "Brown metal",
+    "Champagnemetal": "Champagne metal",
+    "Grå": "Gray",
+    "Gråmetal": "Gray metal",
+    "Grøn": "Green",
+    "Grønmetal": "Green metal",
+    "Hvid": "White",
+    "Hvidmetal": "White metal",
+    "Koks": "Coke",
+    "Koksmetal": "Coke metal",
+    "Lysgrønmetal": "Light green metal",
+    "Mørkblåmetal": "Dark blue metal",
+    "Mørkrødmetal": "Dark red metal",
+    "Rød": "Red",
+    "Rødmetal": "Red metal",
+    "Sort": "Black",
+    "Sortmetal": "Black metal",
+    "Sølv": "Silver",
+    "Sølvmetal": "Silver metal",
+}
+
+# Danish listing names use a comma as decimal separator ("Qashqai 1,2 Dig-T")
+ENGINE_SIZE_RE = re.compile(r"(\d+[,.]\d+)")
+HORSEPOWER_RE = re.compile(r"(\d+)\s*hk", re.IGNORECASE)
+FUEL_CONSUMPTION_RE = re.compile(r"(\d+(?:[,.]\d+)?)\s*km/l", re.IGNORECASE)
+LEADING_NUMBER_RE = re.compile(r"^\s*(\d+(?:[,.]\d+)?)")
+
+
+def js_round(values: pd.Series) -> pd.Series:
+    # Math.round semantics (half up), not Python's banker's rounding
+    return np.floor(values + 0.5)
+
+
+def clean_listing_model(names: pd.Series) -> pd.Series:
+    s = names.fillna("").astype(str).str.lower()
+    s = s.str.replace(r"[-/]", " ", regex=True)
+    # drivetrain tokens, engine sizes (2,0 l / 2,0t / 2,0) and short engine codes (2l)
+    s = s.str.replace(r"\b(awd|4wd|4x4|fwd|rwd)\b", " ", regex=True)
+    s = s.str.replace(r"\b\d[,.]\d\s*[lt]?\b", " ", regex=True)
+    s = s.str.replace(r"\b\d\s*l\b", " ", regex=True)
+    s = s.str.replace(r"\s+", " ", regex=True).str.strip()
+
+    # Remove the first word (brand/manufacturer)
+    parts = s.str.split(" ", n=1)
+    s = parts.str[1].where(parts.str.len() > 1, s)
+    return s.where(s != "", "other")
+
+
+def parse_number(values: pd.Series, pattern: re.Pattern) -> pd.Series:
+    # First number matched by pattern, with either decimal separator; NaN if none
+    matched = values.astype("object").where(values.notna(), "").astype(str).str.extract(pattern)[0]
+    return pd.to_numeric(matched.str.replace(",", ".", regex=False), errors="coerce")
+
+
+def map_manufacturer(makes: pd.Series) -> pd.Series:
+    s = makes.fillna("").astype(str).str.lower().str.strip()
+    return s.where(s.isin(VALID_MANUFACTURERS), "other")
+
+
+def map_transmission(type_ids: pd.Series) -> pd.Series:
+    ids = pd.to_numeric(type_ids, errors="coerce").fillna(0)
+    return pd.Series(
+        np.select([ids == 0, ids == 1, ids.isin([2, 3])], ["manual", "automatic", "manual"], "other"),
+        index=type_ids.index,
+    )
+
+
+def map_drivetrain(drivetrain_ids: pd.Series) -> pd.Series:
+    ids = pd.to_numeric(drivetrain_ids, errors="coerce").fillna(0)
+    return pd.Series(
+        np.select([ids == 0, ids == 1, ids == 2, ids == 3], ["fwd", "rwd", "4wd", "fwd"], "other"),
+        index=drivetrain_ids.index,
+    )
+
+
+def map_fuel_type(fuel_types: pd.Series) -> pd.Series:
+    s = fuel_types.fillna("").astype(str).str.lower().str.strip()
+    return pd.Series(
+        np.select(
+            [s == "benzin", s == "diesel", s == "el", s.str.contains("hybrid|plug-in", regex=True)],
+            ["gas", "diesel", "electric", "hybrid"],
+            "other",
+        ),
+        index=fuel_types.index,
+    )
+
+
+def map_exterior_color(colors: pd.Series) -> pd.Series:
+    s = colors.fillna("").astype(str)
+    s = s.map(lambda c: DANISH_COLORS.get(c, c)).str.lower()
+    # Metal colors are set to premium category
+    return pd.Series(
+        np.select([s.str.contains("metal", regex=False), s.isin(VALID_EXTERIOR_COLORS)], ["premium", s], "other"),
+        index=colors.index,
+    )
+
+
+def engineer_features(listings: pd.DataFrame, current_year: Optional[int] = None) -> pd.DataFrame:
+    """Turn raw Danish listings into the model's input features.
+
+    Follows the notebook's feature engineering (and the mapping that used to
+    live in server/src/scripts/estimateCars.ts), vectorized over all rows.
+    Missing values map to the same defaults the server used.
+    """
+    if current_year is None:
+        current_year = date.today().year
+
+    df = listings.reindex(columns=LISTING_COLUMNS)
+    out = pd.DataFrame(index=df.index)
+
+    year = pd.to_numeric(df["model_year"], errors="coerce").fillna(current_year).astype(int)
+    mileage_km = pd.to_numeric(df["mileage"], errors="coerce").fillna(0)
+    km_per_l = parse_number(df["fuel_consumption"], FUEL_CONSUMPTION_RE).fillna(
+        parse_number(df["fuel_consumption"], LEADING_NUMBER_RE)
+    )
+    engine_size = parse_number(df["name"], ENGINE_SIZE_RE).fillna(
+        parse_number(df["engine_displacement"], LEADING_NUMBER_RE)
+    )
+    hk = parse_number(df["power"], HORSEPOWER_RE)
+
+    out["year"] = year
+    out["mileage"] = js_round(mileage_km * KM_TO_MILES)
+    out["mpg_avg"] = (km_per_l * KM_PER_L_TO_MPG).round(1).fillna(0.0)
+    out["engine_size_l"] = engine_size.fillna(0.0)
+    out["hp"] = js_round(hk * HK_TO_HP).fillna(0.0)
+    out["car_age"] = (current_year - year).astype(float)
+
+    out["manufacturer"] = map_manufacturer(df["make"])
+    out["model"] = clean_listing_model(df["name"])
+    out["transmission"] = map_transmission(df["transmission_type_id"])
+    out["drivetrain"] = map_drivetrain(df["drivetrain_id"])
+    out["fuel_type"] = map_fuel_type(df["fuel_type"])
+    out["exterior_color"] = map_exterior_color(df["color"])
+
+    owners = pd.to_numeric(df["number_of_owners"], errors="coerce").fillna(0)
+    out["accidents_or_damage"] = 0
+    out["one_owner"] = ((owners == 0) | (owners == 1)).astype(int)
+    out["personal_use_only"] = 1
+
+    # Same string formatting as the notebook (str of a float, e.g. "qashqai_1.2")
+    engine_str = out["engine_size_l"].astype(str)
+    out["model_variant"] = extract_variant(df["name"])
+    out["model_engine"] = out["model"] + "_" + engine_str
+    out["model_drivetrain"] = out["model"] + "_" + out["drivetrain"]
+    out["model_full"] = out["model"] + "_" + engine_str + "_" + out["drivetrain"]
+
+    return out[FEATURE_COLUMNS]
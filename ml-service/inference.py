@@ -0,0 +1,328 @@
+import glob
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+
+# Stable dict key for a NaN category
+_NAN_KEY = "__nan__"
+
+# Optional callback receiving (stage, seconds) for the encode/predict split
+Observer = Optional[Callable[[str, float], None]]
+
+# Exported model: LightGBM text model + JSON encoder tables (see export.py)
+ARTIFACT_VERSION = 1
+BOOSTER_FILE = "model.txt"
+ENCODER_FILE = "encoder.json"
+
+# Quantile boosters trained on the same encoded features as the point model
+# (train.py --quantiles), used for the price interval
+QUANTILE_FILE_RE = re.compile(r"quantile_(\d*\.?\d+)\.txt$")
+
+
+def quantile_file(quantile: float) -> str:
+    return f"quantile_{quantile:g}.txt"
+
+
+def companion_quantile_path(model_path: str, quantile: float) -> str:
+    # model/used_car_lgbm_pipeline.pkl -> model/used_car_lgbm_pipeline.quantile_0.1.txt
+    return f"{os.path.splitext(model_path)[0]}.{quantile_file(quantile)}"
+
+
+def find_quantile_files(path: str) -> Dict[float, str]:
+    """Quantile booster files of an artifact dir or next to a pickled pipeline."""
+    if os.path.isdir(path):
+        candidates = glob.glob(os.path.join(glob.escape(path), "quantile_*.txt"))
+    else:
+        candidates = glob.glob(glob.escape(os.path.splitext(path)[0]) + ".quantile_*.txt")
+    found = {}
+    for candidate in candidates:
+        match = QUANTILE_FILE_RE.search(os.path.basename(candidate))
+        if match:
+            found[float(match.group(1))] = candidate
+    return dict(sorted(found.items()))
+
+
+def load_quantile_boosters(files: Dict[float, str], n_features: int) -> Dict[float, Any]:
+    import lightgbm
+
+    boosters = {}
+    for quantile, path in sorted(files.items()):
+        booster = lightgbm.Booster(model_file=path)
+        if booster.num_feature() != n_features:
+            raise ValueError(
+                f"{path} has {booster.num_feature()} features, the model has {n_features}; "
+                f"it was not trained with this model's encoder"
+            )
+        boosters[quantile] = booster
+    return boosters
+
+
+def _vocabulary_key(category):
+    if isinstance(category, np.generic):
+        category = category.item()
+    if isinstance(category, float) and category != category:
+        return _NAN_KEY
+    return category
+
+
+class CompiledPipeline:
+    """Pandas-free replacement for the sklearn pipeline's predict.
+
+    The fitted ColumnTransformer is compiled into plain lookup tables (one
+    dict per one-hot encoded column mapping category -> output column, plus
+    the output columns of the passthrough numerics) so a request can be
+    written straight into a NumPy row and handed to the LightGBM booster.
+    """
+
+    def __init__(
+        self,
+        booster,
+        categorical_columns: Sequence[str],
+        vocabularies: Sequence[Dict[Any, int]],
+        numeric_columns: Sequence[str],
+        numeric_offsets: Sequence[int],
+        n_features: int,
+    ):
+        self.booster = booster
+        self.categorical_columns = list(categorical_columns)
+        self.vocabularies = list(vocabularies)
+        self.numeric_columns = list(numeric_columns)
+        self.numeric_offsets = np.asarray(numeric_offsets, dtype=np.intp)
+        self.n_features = n_features
+
+        # quantile -> booster over the same features, for predict_*_interval
+        self.quantile_boosters: Dict[float, Any] = {}
+
+        # LightGBM threads per predict call, 0 means LightGBM's default
+        self.num_threads = 0
+
+        # Each request thread gets its own preallocated row
+        self._local = threading.local()
+
+    @classmethod
+    def from_sklearn(cls, pipeline) -> "CompiledPipeline":
+        preprocess = pipeline.named_steps["preprocess"]
+        regressor = pipeline.steps[-1][1]
+
+        categorical_columns: list[str] = []
+        vocabularies: list[dict] = []
+        numeric_columns: list[str] = []
+        numeric_offsets: list[int] = []
+
+        for name, transformer, columns in preprocess.transformers_:
+            if name == "remainder":
+                continue
+            offset = preprocess.output_indices_[name].start
+
+            if name == "cat":
+                # handle_unknown="ignore": unknown categories leave the row all zeros
+                for column, categories in zip(columns, transformer.categories_):
+                    vocabularies.append(
+                        {_vocabulary_key(cat): offset + i for i, cat in enumerate(categories)}
+                    )
+                    categorical_columns.append(column)
+                    offset += len(categories)
+            elif name == "num":
+                for i, column in enumerate(columns):
+                    numeric_columns.append(column)
+                    numeric_offsets.append(offset + i)
+            else:
+                raise ValueError(f"Unsupported transformer in preprocessor: {name}")
+
+        return cls(
+            booster=regressor.booster_,
+            categorical_columns=categorical_columns,
+            vocabularies=vocabularies,
+            numeric_columns=numeric_columns,
+            numeric_offsets=numeric_offsets,
+            n_features=regressor.n_features_in_,
+        )
+
+    @classmethod
+    def from_artifact(cls, directory: str) -> "CompiledPipeline":
+        # Imported here so only this path needs LightGBM, and no sklearn/joblib
+        import lightgbm
+
+        with open(os.path.join(directory, ENCODER_FILE), "r", encoding="utf-8") as f:
+            encoder = json.load(f)
+        if encoder.get("version") != ARTIFACT_VERSION:
+            raise ValueError(
+                f"Unsupported model artifact version {encoder.get('version')!r} in {directory}, "
+                f"expected {ARTIFACT_VERSION}"
+            )
+
+        vocabularies = [
+            {_NAN_KEY if cat is None else cat: column["offset"] + i for i, cat in enumerate(column["categories"])}
+            for column in encoder["categorical"]
+        ]
+        compiled = cls(
+            booster=lightgbm.Booster(model_file=os.path.join(directory, BOOSTER_FILE)),
+            categorical_columns=[column["name"] for column in encoder["categorical"]],
+            vocabularies=vocabularies,
+            numeric_columns=[column["name"] for column in encoder["numeric"]],
+            numeric_offsets=[column["offset"] for column in encoder["numeric"]],
+            n_features=encoder["n_features"],
+        )
+        compiled.quantile_boosters = load_quantile_boosters(
+            {float(q): os.path.join(directory, name) for q, name in encoder.get("quantiles", {}).items()},
+            compiled.n_features,
+        )
+        return compiled
+
+    @staticmethod
+    def is_artifact(directory: str) -> bool:
+        return all(os.path.isfile(os.path.join(directory, name)) for name in (BOOSTER_FILE, ENCODER_FILE))
+
+    @staticmethod
+    def artifact_metadata(directory: str) -> Dict[str, Any]:
+        with open(os.path.join(directory, ENCODER_FILE), "r", encoding="utf-8") as f:
+            encoder = json.load(f)
+        return {k: v for k, v in encoder.items() if k not in ("categorical", "numeric")}
+
+    def save_artifact(self, directory: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.booster.save_model(os.path.join(directory, BOOSTER_FILE))
+        for quantile, booster in self.quantile_boosters.items():
+            booster.save_model(os.path.join(directory, quantile_file(quantile)))
+
+        categorical = []
+        for column, vocabulary in zip(self.categorical_columns, self.vocabularies):
+            # One-hot columns of a feature are contiguous, store them as offset + ordered categories
+            ordered = sorted(vocabulary.items(), key=lambda item: item[1])
+            offset = ordered[0][1] if ordered else 0
+            if [idx for _, idx in ordered] != list(range(offset, offset + len(ordered))):
+                raise ValueError(f"One-hot columns of {column} are not contiguous")
+            categorical.append({
+                "name": column,
+                "offset": offset,
+                "categories": [None if cat == _NAN_KEY else cat for cat, _ in ordered],
+            })
+
+        encoder = {
+            **(metadata or {}),
+            "version": ARTIFACT_VERSION,
+            "n_features": self.n_features,
+            "categorical": categorical,
+            "numeric": [
+                {"name": column, "offset": int(offset)}
+                for column, offset in zip(self.numeric_columns, self.numeric_offsets)
+            ],
+            "quantiles": {f"{q:g}": quantile_file(q) for q in self.quantile_boosters},
+        }
+        with open(os.path.join(directory, ENCODER_FILE), "w", encoding="utf-8") as f:
+            json.dump(encoder, f, ensure_ascii=False, separators=(",", ":"))
+
+    def _row_buffer(self) -> np.ndarray:
+        row = getattr(self._local, "row", None)
+        if row is None:
+            row = np.zeros((1, self.n_features), dtype=np.float64)
+            self._local.row = row
+        return row
+
+    def encode_indices(self, car: Dict[str, Any]) -> List[int]:
+        # Output columns set to 1.0 by the one-hot encoder
+        indices = []
+        for column, vocabulary in zip(self.categorical_columns, self.vocabularies):
+            value = car[column]
+            idx = vocabulary.get(value)
+            if idx is None and value != value:
+                # NaN never equals itself, look up the fitted NaN category instead
+                idx = vocabulary.get(_NAN_KEY)
+            if idx is not None:
+                indices.append(idx)
+        return indices
+
+    def _predict_one(self, car: Dict[str, Any], boosters: Sequence[Any], observe: Observer) -> List[float]:
+        # Encodes the row once and runs every booster on it
+        started = time.perf_counter()
+        row = self._row_buffer()
+        hot = self.encode_indices(car)
+
+        row[0, hot] = 1.0
+        row[0, self.numeric_offsets] = [car[c] for c in self.numeric_columns]
+        encoded = time.perf_counter()
+        try:
+            return [float(b.predict(row, num_threads=self.num_threads)[0]) for b in boosters]
+        finally:
+            # Reset only what was written so the buffer is all zeros again
+            row[0, hot] = 0.0
+            row[0, self.numeric_offsets] = 0.0
+            if observe is not None:
+                observe("encode", encoded - started)
+                observe("predict", time.perf_counter() - encoded)
+
+    def predict_one(self, car: Dict[str, Any], observe: Observer = None) -> float:
+        return self._predict_one(car, (self.booster,), observe)[0]
+
+    def predict_one_interval(self, car: Dict[str, Any], observe: Observer = None) -> Tuple[float, Dict[float, float]]:
+        values = self._predict_one(car, (self.booster, *self.quantile_boosters.values()), observe)
+        return values[0], dict(zip(self.quantile_boosters, values[1:]))
+
+    def encode_many(self, cars: Sequence[Dict[str, Any]]) -> sp.csr_matrix:
+        numeric_offsets = self.numeric_offsets.tolist()
+
+        indptr = [0]
+        indices: list[int] = []
+        data: list[float] = []
+        for car in cars:
+            hot = self.encode_indices(car)
+            indices.extend(hot)
+            indices.extend(numeric_offsets)
+            data.extend([1.0] * len(hot))
+            data.extend(float(car[c]) for c in self.numeric_columns)
+            indptr.append(len(indices))
+
+        return sp.csr_matrix(
+            (np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(cars), self.n_features),
+        )
+
+    def _predict_many(self, cars: Sequence[Dict[str, Any]], boosters: Sequence[Any], observe: Observer) -> List[np.ndarray]:
+        if not cars:
+            return [np.empty(0, dtype=np.float64) for _ in boosters]
+        started = time.perf_counter()
+        matrix = self.encode_many(cars)
+        encoded = time.perf_counter()
+        preds = [b.predict(matrix, num_threads=self.num_threads) for b in boosters]
+        if observe is not None:
+            observe("encode", encoded - started)
+            observe("predict", time.perf_counter() - encoded)
+        return preds
+
+    def predict_many(self, cars: Sequence[Dict[str, Any]], observe: Observer = None) -> np.ndarray:
+        return self._predict_many(cars, (self.booster,), observe)[0]
+
+    def predict_many_interval(
+        self, cars: Sequence[Dict[str, Any]], observe: Observer = None
+    ) -> Tuple[np.ndarray, Dict[float, np.ndarray]]:
+        preds = self._predict_many(cars, (self.booster, *self.quantile_boosters.values()), observe)
+        return preds[0], dict(zip(self.quantile_boosters, preds[1:]))
+
+    def sample_records(self, n: int) -> List[Dict[str, Any]]:
+        # Deterministic rows cycling through every vocabulary, for self-checks
+        records = []
+        for i in range(n):
+            car: Dict[str, Any] = {}
+            for column, vocabulary in zip(self.categorical_columns, self.vocabularies):
+                keys = list(vocabulary)
+                key = keys[(i * 7919) % len(keys)]
+                car[column] = float("nan") if key == _NAN_KEY else key
+            for j, column in enumerate(self.numeric_columns):
+                car[column] = float((i + 1) * (j + 3) % 97) * 1.5
+            records.append(car)
+        return records
+
+    def matches(self, pipeline, frame) -> bool:
+        # The compiled path must reproduce the sklearn pipeline bit for bit
+        records = frame.to_dict("records")
+        expected = pipeline.predict(frame)
+        single = np.array([self.predict_one(r) for r in records])
+        many = self.predict_many(records)
+        return np.array_equal(expected, single) and np.array_equal(expected, many)
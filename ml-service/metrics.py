@@ -0,0 +1,283 @@
+"""Prometheus text-format metrics and a sampling profiler for ml-service.
+
+Kept dependency free: counters and histograms are plain dicts of label
+values guarded by a lock, rendered in the text exposition format on
+GET /metrics. Metrics are per process, with serve.py every worker keeps
+its own (scrape each worker or aggregate them downstream).
+"""
+import bisect
+import sys
+import threading
+import time
+from collections import Counter as _Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+ROW_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(Metric):
+    """Gauge whose values are read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in sorted(self.collect().items())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = []
+        for labels, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def add(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.add(Counter("ml_http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+REQUEST_SECONDS = REGISTRY.add(Histogram("ml_http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+STAGE_SECONDS = REGISTRY.add(Histogram(
+    "ml_stage_duration_seconds",
+    "Time spent per stage of a prediction request",
+    ("route", "stage", "model_version"),
+))
+BATCH_ROWS = REGISTRY.add(Histogram("ml_batch_rows", "Rows per batch request", ("route",), buckets=ROW_BUCKETS))
+PREDICTIONS = REGISTRY.add(Counter("ml_predictions_total", "Rows scored", ("route", "model_version")))
+CACHE_LOOKUPS = REGISTRY.add(Counter("ml_cache_lookups_total", "Prediction cache lookups", ("model_version", "result")))
+SHADOW_PREDICTIONS = REGISTRY.add(Counter("ml_shadow_predictions_total", "Rows scored by the shadow model", ("model_version",)))
+
+
+class StageTimer:
+    """Collects stage durations for one request, under one route and model version."""
+
+    __slots__ = ("route", "model_version")
+
+    def __init__(self, route: str, model_version: str = ""):
+        self.route = route
+        self.model_version = model_version
+
+    def observe(self, stage: str, seconds: float) -> None:
+        STAGE_SECONDS.observe(seconds, self.route, stage, self.model_version)
+
+    @contextmanager
+    def time(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting and timing every request by its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Picked up by handlers to time body parsing + validation before they run
+        scope.setdefault("state", {})["started"] = started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Route template, not the raw path, so /models/{version} stays one series
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUESTS.inc(scope["method"], route, str(status[0]))
+            REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], route)
+
+
+# Leaf frames of threads that are just waiting (event loop, idle threadpool
+# workers, the model watcher); not sampled so busy stacks stand out
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("registry.py", "_watch"),
+}
+
+
+class SamplingProfiler:
+    """Samples the stacks of all other threads at a fixed interval.
+
+    Uses sys._current_frames(), so it needs no tracing hooks and costs the
+    request threads nothing beyond the GIL the sampler takes. Results are
+    folded stacks ("outer;inner;leaf count"), readable by flamegraph.pl and
+    speedscope.
+    """
+
+    def __init__(self):
+        self.interval = 0.005
+        self.samples: _Counter = _Counter()
+        self.total = 0
+        self.started_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.005) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self.interval = interval
+            self.samples = _Counter()
+            self.total = 0
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                code = frame.f_code
+                if ident == own or (code.co_filename.rsplit("/", 1)[-1], code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                with self._lock:
+                    self.samples[key] += 1
+                    self.total += 1
+
+    def folded(self, limit: int = 0) -> str:
+        with self._lock:
+            items = self.samples.most_common(limit or None)
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def status(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "running": self.running,
+                "interval": self.interval,
+                "samples": self.total,
+                "stacks": len(self.samples),
+                "started_at": self.started_at,
+            }
+
+
+PROFILER = SamplingProfiler()
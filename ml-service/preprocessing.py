@@ -0,0 +1,285 @@
+"""Vectorized versions of the notebook's (CTC.ipynb) text preprocessing.
+
+Each function takes a whole column and only runs the string logic on its
+unique values, then maps the results back. Outputs are the same as the
+notebook's row-wise `Series.apply` versions.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# Variants map, earlier entries win when a model name contains several
+VARIANTS = [
+    # Common trims
+    "base", "s", "se", "sel", "ses",
+    "sl", "slt", "sle",
+    "sr", "sr5",
+    "sx", "sxt",
+
+    # Toyota
+    "le", "xle", "xse",
+
+    # Honda/Kia/Hyundai
+    "lx", "ex", "lxs",
+
+    # GM / Chevrolet trims
+    "lt", "1lt", "2lt", "ltz", "ls",
+
+    # Premium trims
+    "premium",
+    "limited",
+    "platinum",
+    "luxury",
+    "touring",
+    "reserve",
+    "denali",
+    "lariat",
+    "titanium",
+
+    # Performance / sport packages
+    "sport",
+    "gt",
+    "turbo",
+    "supercharged",
+    "srt", "srt8",
+    "scat",
+    "gti",
+    "raptor",
+    "hellcat",
+
+    # Jeep-related
+    "latitude",
+    "trailhawk",
+    "sahara",
+    "rubicon",
+    "overland",
+    "altitude",
+    "laredo",
+
+    # Ram-related
+    "big horn",
+    "tradesman",
+    "longhorn",
+    "rebel",
+    "warlock",
+
+    # Volvo
+    "inscription",
+    "momentum",
+
+    # Misc valid trims
+    "prestige",
+    "classic",
+    "preferred",
+    "premier",
+]
+
+VARIANT_PRIORITY = {v: i for i, v in enumerate(VARIANTS)}
+
+# All variants in one alternation; the \b on both sides makes the match
+# independent of alternation order, priority is applied afterwards
+VARIANT_RE = re.compile(r"\b(" + "|".join(re.escape(v) for v in VARIANTS) + r")\b")
+
+BASE_COLORS = [
+    "black", "white", "gray", "silver", "red", "blue", "green",
+    "brown", "beige", "tan", "gold", "yellow", "orange", "purple",
+]
+
+PREMIUM_KEYWORDS = [
+    "metal", "met", "metallic", "pearl", "pearlcoat", "mica",
+    "coat", "tri", "tinted", "crystal", "diamond",
+    "premium", "luxury", "magno", "matte", "satin",
+]
+
+PREMIUM_RE = re.compile("|".join(re.escape(k) for k in PREMIUM_KEYWORDS))
+
+BASE_COLOR_PRIORITY = {c: i for i, c in enumerate(BASE_COLORS)}
+
+# First word (after cleaning) that contains a base color anywhere in it
+BASE_COLOR_WORD_RE = re.compile(r"(?:^| )([a-z]*?(?:" + "|".join(BASE_COLORS) + r")[a-z]*)")
+# Every base color in a word, overlapping ones included ("grayellow"); the
+# notebook takes the first in BASE_COLORS order, not the first in the word
+BASE_COLOR_RE = re.compile(r"(?=(" + "|".join(BASE_COLORS) + r"))")
+
+
+def _map_unique(values: pd.Series, transform, missing: str = "other") -> pd.Series:
+    # Run transform on the unique non-null values only and map the results back
+    uniques = pd.Series(values.dropna().unique(), dtype=object)
+    if uniques.empty:
+        return pd.Series(missing, index=values.index, dtype=object)
+    lookup = dict(zip(uniques, transform(uniques.astype(str))))
+    return values.map(lookup).where(values.notna(), missing).astype(object)
+
+
+def _normalize_separators(s: pd.Series) -> pd.Series:
+    # e.g. "XLE/SE", "Sierra-1500"
+    return s.str.lower().str.replace(r"[-/]", " ", regex=True)
+
+
+def _pick_variant(found: list) -> str:
+    return min(found, key=VARIANT_PRIORITY.__getitem__) if found else "other"
+
+
+def _pick_color(found) -> str:
+    # NaN when no word had a base color
+    if not isinstance(found, list) or not found:
+        return "other"
+    return min(found, key=BASE_COLOR_PRIORITY.__getitem__)
+
+
+def extract_variant(models: pd.Series) -> pd.Series:
+    """Trim variant found in each model name, "other" if none."""
+    def transform(s: pd.Series) -> np.ndarray:
+        found = _normalize_separators(s).str.findall(VARIANT_RE)
+        return np.array([_pick_variant(f) for f in found], dtype=object)
+
+    return _map_unique(models, transform)
+
+
+def clean_model(models: pd.Series) -> pd.Series:
+    """Model name without drivetrain tokens and engine sizes."""
+    def transform(s: pd.Series) -> np.ndarray:
+        s = _normalize_separators(s)
+        s = s.str.replace(r"\b(awd|4wd|4x4|fwd|rwd)\b", " ", regex=True)
+        s = s.str.replace(r"\b\d\.\d\s*l\b", " ", regex=True)  # 2.0L
+        s = s.str.replace(r"\b\d\.\d\s*t\b", " ", regex=True)  # 2.0t
+        s = s.str.replace(r"\b\d\.\d\b", " ", regex=True)      # 2.0
+        s = s.str.replace(r"\b\d\s*l\b", " ", regex=True)      # 2l
+        s = s.str.replace(r"\s+", " ", regex=True).str.strip()
+        return s.where(s != "", "other").to_numpy(dtype=object)
+
+    return _map_unique(models, transform)
+
+
+def map_color(colors: pd.Series) -> pd.Series:
+    """Exterior color as a base color, "premium" or "other"."""
+    def transform(s: pd.Series) -> np.ndarray:
+        s = s.str.lower()
+        premium = s.str.contains(PREMIUM_RE)
+
+        cleaned = s.str.replace(r"[^a-z ]", " ", regex=True)
+        cleaned = cleaned.str.replace(r"\s+", " ", regex=True).str.strip()
+        found = cleaned.str.extract(BASE_COLOR_WORD_RE)[0].str.findall(BASE_COLOR_RE)
+        base = np.array([_pick_color(f) for f in found], dtype=object)
+        base[base == "tan"] = "beige"
+
+        return np.where(premium, "premium", base).astype(object)
+
+    return _map_unique(colors, transform)
+
+
+# Raw fuel_type values -> training categories, unlisted values become NaN
+FUEL_MAPPING = {
+    # Gasoline
+    'Gas': 'gas',
+    'Gasoline': 'gas',
+    'Gasoline Fuel': 'gas',
+    'Premium': 'gas',
+    'Premium Unleaded': 'gas',
+    'Premium (Required)': 'gas',
+    'Regular Unleaded': 'gas',
+    'G': 'gas',
+
+    # Diesel
+    'Diesel': 'diesel',
+    'Diesel Fuel': 'diesel',
+    'Bio Diesel': 'diesel',
+    'Biodiesel': 'diesel',
+
+    # Hybrid
+    'Hybrid': 'hybrid',
+    'Hybrid Fuel': 'hybrid',
+    'Gas/Electric Hybrid': 'hybrid',
+    'Gasoline/Mild Electric Hybrid': 'hybrid',
+    'Plug-In Hybrid': 'hybrid',
+    'Plug-In Electric/Gas': 'hybrid',
+    'PHEV': 'hybrid',
+
+    # Electric
+    'Electric': 'electric',
+    'Electric Fuel System': 'electric',
+
+    # Flex fuel (E85)
+    'E85 Fl': 'flex_fuel',
+    'E85 Flex Fuel': 'flex_fuel',
+    'Flex Fuel': 'flex_fuel',
+    'Flex Fuel Capability': 'flex_fuel',
+    'Flexible Fuel': 'flex_fuel',
+
+    # Natural gas
+    'Compressed Natural Gas': 'ng',
+    'Natural Gas': 'ng',
+    'Gaseous': 'ng',
+    'Bi-Fuel': 'ng',
+
+    # Other / unknown
+    'Other': 'other',
+    'Unspecified': 'other',
+    'B': 'other',
+}
+
+# (category, substrings) checked in order, first hit wins
+TRANSMISSION_RULES = [
+    ("manual", ["manual", "m/t", "tremec", "stick", "spd manual"]),
+    ("cvt", ["cvt", "continuously variable", "xtronic", "lineartronic", "ivt", "ecvt", "e-cvt", "i-cvt"]),
+    ("single_speed", [
+        "single speed", "single-speed", "single speed reducer", "single reduction",
+        "single-speed reduction", "fixed gear", "reduction gear",
+    ]),
+    ("automatic", [
+        "auto", "a/t", "tiptronic", "steptronic", "speedshift", "geartronic", "dct",
+        "dual clutch", "dual-clutch", "pdk", "torqshift", "powershift", "allison",
+        "skyactiv-drive", "multispeed", "multi-speed",
+    ]),
+]
+
+DRIVETRAIN_RULES = [
+    ("4wd", ["4wd", "4x4", "four wheel drive", "four-wheel drive", "four-wheel"]),
+    ("awd", ["awd", "all wheel drive", "all-wheel drive", "all-wheel"]),
+    ("fwd", ["fwd", "front wheel drive", "front-wheel drive", "front-wheel"]),
+    ("rwd", ["rwd", "rear wheel drive", "rear-wheel drive", "rear-wheel"]),
+    # 4x2 is ambiguous (2WD truck) – treat as RWD for now
+    ("rwd", ["4x2"]),
+]
+
+
+def _apply_rules(s: pd.Series, rules) -> np.ndarray:
+    s = s.str.lower().str.strip()
+    conditions = [
+        s.str.contains("|".join(re.escape(k) for k in keywords), regex=True)
+        for _, keywords in rules
+    ]
+    return np.select(conditions, [category for category, _ in rules], "other").astype(object)
+
+
+def map_fuel_type(fuel_types: pd.Series) -> pd.Series:
+    return fuel_types.map(FUEL_MAPPING)
+
+
+def map_transmission(transmissions: pd.Series) -> pd.Series:
+    return _map_unique(transmissions, lambda s: _apply_rules(s, TRANSMISSION_RULES))
+
+
+def map_drivetrain(drivetrains: pd.Series) -> pd.Series:
+    def transform(s: pd.Series) -> np.ndarray:
+        # Engine-text garbage that was scraped into this column by mistake
+        engine_text = s.str.lower().str.strip().str.startswith("engine:")
+        return np.where(engine_text, "other", _apply_rules(s, DRIVETRAIN_RULES)).astype(object)
+
+    return _map_unique(drivetrains, transform)
+
+
+def mpg_average(mpg: pd.Series) -> pd.Series:
+    """MPG strings as one number, the midpoint for ranges like "30-35"."""
+    def transform(s: pd.Series) -> np.ndarray:
+        nums = s.str.strip().str.findall(r"\d+\.?\d*")
+        return np.array(
+            [
+                (float(n[0]) + float(n[1])) / 2 if len(n) == 2 else float(n[0]) if len(n) == 1 else np.nan
+                for n in nums
+            ],
+            dtype=float,
+        )
+
+    return _map_unique(mpg, transform, missing=np.nan).astype(float)
@@ -0,0 +1,401 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from inference import BOOSTER_FILE, ENCODER_FILE, CompiledPipeline, find_quantile_files, load_quantile_boosters
+
+
+def source_files(path: str) -> List[str]:
+    # Files a model version is loaded from: an export.py artifact dir or a
+    # pickled pipeline, plus its quantile boosters
+    quantiles = list(find_quantile_files(path).values())
+    if os.path.isdir(path):
+        return [os.path.join(path, BOOSTER_FILE), os.path.join(path, ENCODER_FILE)] + quantiles
+    return [path] + quantiles
+
+
+def file_signature(paths: List[str]) -> Optional[Tuple]:
+    try:
+        return tuple((st.st_mtime_ns, st.st_size, st.st_ino) for st in (os.stat(p) for p in paths))
+    except OSError:
+        return None
+
+
+def watch_signature(paths: Sequence[str]) -> Tuple:
+    # Like file_signature, but a missing file is part of the signature, not an error
+    return tuple(file_signature([p]) for p in paths)
+
+
+def price_band(pred, quantiles: Dict[float, Any]) -> Tuple[Any, Any]:
+    # Lowest and highest quantile as the band, widened to always contain the
+    # point prediction (independently trained quantile models can cross it)
+    low, high = quantiles[min(quantiles)], quantiles[max(quantiles)]
+    return np.minimum(low, pred), np.maximum(high, pred)
+
+
+class ModelVersion:
+    """One loaded model, either from an artifact dir or a pickled pipeline.
+
+    Immutable once loaded: a reload builds a new ModelVersion and swaps it
+    in, so a request keeps using the version it started with.
+    """
+
+    def __init__(
+        self, name: str, path: str, fast_path: bool = True, num_threads: int = 0, watch: Sequence[str] = ()
+    ):
+        self.name = name
+        self.path = path
+        # Files not loaded from whose changes should still reload this version
+        self.watch = tuple(watch)
+        self.pipeline = None
+        self.engine: Optional[CompiledPipeline] = None
+        self.quantile_boosters: Dict[float, Any] = {}
+        self.num_threads = num_threads
+
+        files = source_files(path)
+        self.signature = self.current_signature()
+        digest = hashlib.sha256()
+        for p in files:
+            with open(p, "rb") as f:
+                digest.update(f.read())
+        # Content hash, prediction cache entries are keyed on it
+        self.digest = digest.hexdigest()[:16]
+
+        if CompiledPipeline.is_artifact(path):
+            self.engine = CompiledPipeline.from_artifact(path)
+            self.quantile_boosters = self.engine.quantile_boosters
+        else:
+            import joblib
+
+            # Load the full pipeline (preprocessor + LightGBM)
+            self.pipeline = joblib.load(path)
+            self.quantile_boosters = load_quantile_boosters(
+                find_quantile_files(path), self.pipeline.steps[-1][1].n_features_in_
+            )
+            if fast_path:
+                self.engine = CompiledPipeline.from_sklearn(self.pipeline)
+                self.engine.quantile_boosters = self.quantile_boosters
+
+        self.set_num_threads(num_threads)
+
+        # Only serve from the compiled pipeline if it reproduces the sklearn pipeline exactly
+        if self.engine is not None and self.pipeline is not None:
+            import pandas as pd
+
+            if not self.engine.matches(self.pipeline, pd.DataFrame(self.engine.sample_records(64))):
+                print(f"WARNING: compiled pipeline of {name} does not match the sklearn pipeline, using the pipeline")
+                self.engine = None
+
+        self.loaded_at = time.time()
+
+    def current_signature(self) -> Optional[Tuple]:
+        # None while a source file is missing, e.g. half way through a rewrite
+        signature = file_signature(source_files(self.path))
+        return None if signature is None else (signature, watch_signature(self.watch))
+
+    @property
+    def interval_quantiles(self) -> Optional[List[float]]:
+        # Quantile levels of the price band, None without at least two quantile boosters
+        if len(self.quantile_boosters) < 2:
+            return None
+        return [min(self.quantile_boosters), max(self.quantile_boosters)]
+
+    def set_num_threads(self, num_threads: int) -> None:
+        self.num_threads = num_threads
+        if self.pipeline is not None:
+            # n_jobs=-1 on the sklearn estimator also means "all cores"
+            self.pipeline.steps[-1][1].set_params(n_jobs=num_threads or -1)
+        if self.engine is not None:
+            self.engine.num_threads = num_threads
+
+    def predict_one(self, features: Dict[str, Any], timer=None) -> float:
+        observe = timer.observe if timer is not None else None
+        if self.engine is not None:
+            return self.engine.predict_one(features, observe)
+        return float(self._predict_pipeline([features], list(features), observe)[0][0])
+
+    def predict_one_interval(self, features: Dict[str, Any], timer=None) -> Tuple[float, float, float]:
+        """Price and its band from one encoding pass; needs interval_quantiles."""
+        observe = timer.observe if timer is not None else None
+        if self.engine is not None:
+            pred, quantiles = self.engine.predict_one_interval(features, observe)
+        else:
+            preds, quantiles = self._predict_pipeline([features], list(features), observe, with_quantiles=True)
+            pred, quantiles = float(preds[0]), {q: float(v[0]) for q, v in quantiles.items()}
+        low, high = price_band(pred, quantiles)
+        return pred, float(low), float(high)
+
+    def predict_many(self, rows: List[Dict[str, Any]], columns: List[str], timer=None) -> np.ndarray:
+        # One vectorized model call for all rows
+        observe = timer.observe if timer is not None else None
+        if self.engine is not None:
+            return self.engine.predict_many(rows, observe)
+        return self._predict_pipeline(rows, columns, observe)[0]
+
+    def predict_many_interval(
+        self, rows: List[Dict[str, Any]], columns: List[str], timer=None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        observe = timer.observe if timer is not None else None
+        if self.engine is not None:
+            preds, quantiles = self.engine.predict_many_interval(rows, observe)
+        else:
+            preds, quantiles = self._predict_pipeline(rows, columns, observe, with_quantiles=True)
+        low, high = price_band(preds, quantiles)
+        return preds, low, high
+
+    def _predict_pipeline(
+        self, rows: List[Dict[str, Any]], columns: List[str], observe, with_quantiles: bool = False
+    ) -> Tuple[np.ndarray, Dict[float, np.ndarray]]:
+        import pandas as pd
+
+        # Same as pipeline.predict, split up so every step can be timed
+        started = time.perf_counter()
+        data = pd.DataFrame.from_records(rows, columns=columns)
+        built = time.perf_counter()
+        X = self.pipeline[:-1].transform(data)
+        transformed = time.perf_counter()
+        preds = self.pipeline[-1].predict(X)
+        quantiles = {}
+        if with_quantiles:
+            quantiles = {
+                q: booster.predict(X, num_threads=self.num_threads) for q, booster in self.quantile_boosters.items()
+            }
+        if observe is not None:
+            observe("dataframe", built - started)
+            observe("encode", transformed - built)
+            observe("predict", time.perf_counter() - transformed)
+        return preds, quantiles
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "version": self.name,
+            "path": self.path,
+            "digest": self.digest,
+            "fast_path": self.engine is not None,
+            "quantiles": list(self.quantile_boosters),
+            "loaded_at": self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    """Loaded model versions, the active one and an optional shadow.
+
+    Swaps are a single reference assignment under a lock, so requests in
+    flight finish on the version they started with. A background thread
+    reloads versions whose files change on disk and, if state_path is set,
+    follows the version list / active / shadow written there by any worker
+    (admin calls only reach one worker of serve.py).
+    """
+
+    def __init__(
+        self,
+        fast_path: bool = True,
+        num_threads: int = 0,
+        state_path: Optional[str] = None,
+        check_interval: float = 2.0,
+    ):
+        self.fast_path = fast_path
+        self.num_threads = num_threads
+        self.state_path = state_path
+        self.check_interval = check_interval
+
+        self._versions: Dict[str, ModelVersion] = {}
+        self._active: Optional[str] = None
+        self._shadow: Optional[str] = None
+        self._shadow_stats: Dict[str, Dict[str, float]] = {}
+        # Versions whose path is picked again on every reload, e.g. artifact or pickle
+        self._resolvers: Dict[str, Callable[[], str]] = {}
+        self._lock = threading.Lock()
+        # Serializes loads so the watcher and admin calls don't load the same files twice
+        self._load_lock = threading.Lock()
+        self._state_signature = None
+        self._watcher_pid: Optional[int] = None
+        self.reloads = 0
+
+    # Lookup
+
+    def get(self, name: Optional[str] = None) -> ModelVersion:
+        with self._lock:
+            key = self._active if name is None else name
+            version = self._versions.get(key) if key is not None else None
+        if version is None:
+            raise KeyError(name)
+        return version
+
+    def shadow(self) -> Optional[ModelVersion]:
+        with self._lock:
+            return self._versions.get(self._shadow) if self._shadow is not None else None
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": self._active,
+                "shadow": self._shadow,
+                "versions": [v.info() for v in self._versions.values()],
+                "shadow_stats": {k: dict(v) for k, v in self._shadow_stats.items()},
+                "reloads": self.reloads,
+            }
+
+    # Changes
+
+    def load(
+        self,
+        name: str,
+        path: str,
+        activate: bool = False,
+        persist: bool = True,
+        watch: Sequence[str] = (),
+        resolve: Optional[Callable[[], str]] = None,
+    ) -> ModelVersion:
+        """Load path as version name.
+
+        Changes to the watch files reload the version too, and with resolve
+        the path is then resolve()'s answer instead of path, so a reload
+        loads what a restart would.
+        """
+        # Load outside the swap lock, predictions keep running meanwhile
+        with self._load_lock:
+            version = ModelVersion(name, path, fast_path=self.fast_path, num_threads=self.num_threads, watch=watch)
+        with self._lock:
+            if resolve is not None:
+                self._resolvers[name] = resolve
+            else:
+                self._resolvers.pop(name, None)
+            replaced = name in self._versions
+            self._versions[name] = version
+            if activate or self._active is None:
+                self._active = name
+            if replaced:
+                self.reloads += 1
+                self._shadow_stats.pop(name, None)
+        if persist:
+            self._save_state()
+        return version
+
+    def activate(self, name: str) -> None:
+        with self._lock:
+            if name not in self._versions:
+                raise KeyError(name)
+            self._active = name
+        self._save_state()
+
+    def set_shadow(self, name: Optional[str]) -> None:
+        with self._lock:
+            if name is not None and name not in self._versions:
+                raise KeyError(name)
+            self._shadow = name
+            if name is not None:
+                self._shadow_stats.pop(name, None)
+        self._save_state()
+
+    def unload(self, name: str) -> None:
+        with self._lock:
+            if name not in self._versions:
+                raise KeyError(name)
+            if name == self._active:
+                raise ValueError(f"{name} is the active version, activate another one first")
+            del self._versions[name]
+            self._resolvers.pop(name, None)
+            if self._shadow == name:
+                self._shadow = None
+        self._save_state()
+
+    def set_num_threads(self, num_threads: int) -> None:
+        with self._lock:
+            self.num_threads = num_threads
+            versions = list(self._versions.values())
+        for version in versions:
+            version.set_num_threads(num_threads)
+
+    def record_shadow(self, name: str, primary: np.ndarray, shadow: np.ndarray) -> None:
+        diff = np.abs(np.asarray(shadow, dtype=np.float64) - np.asarray(primary, dtype=np.float64))
+        rel = diff / np.maximum(np.abs(primary), 1e-9)
+        with self._lock:
+            stats = self._shadow_stats.setdefault(
+                name, {"rows": 0, "mean_abs_diff": 0.0, "mean_rel_diff": 0.0, "max_abs_diff": 0.0}
+            )
+            n = stats["rows"] + len(diff)
+            if n == 0:
+                return
+            # Running means, so the stats don't grow with traffic
+            stats["mean_abs_diff"] += (float(diff.sum()) - stats["mean_abs_diff"] * len(diff)) / n
+            stats["mean_rel_diff"] += (float(rel.sum()) - stats["mean_rel_diff"] * len(diff)) / n
+            stats["max_abs_diff"] = max(stats["max_abs_diff"], float(diff.max(initial=0.0)))
+            stats["rows"] = n
+
+    # Shared state file and file watching
+
+    def _save_state(self) -> None:
+        if not self.state_path:
+            return
+        with self._lock:
+            state = {
+                "versions": {name: v.path for name, v in self._versions.items()},
+                "active": self._active,
+                "shadow": self._shadow,
+            }
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+        self._state_signature = file_signature([self.state_path])
+
+    def _apply_state(self) -> None:
+        signature = file_signature([self.state_path])
+        if signature is None or signature == self._state_signature:
+            return
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        self._state_signature = signature
+
+        wanted: Dict[str, str] = state.get("versions", {})
+        for name, path in wanted.items():
+            current = self._versions.get(name)
+            if current is None or current.path != path:
+                watch = current.watch if current is not None else ()
+                self.load(name, path, persist=False, watch=watch, resolve=self._resolvers.get(name))
+        with self._lock:
+            for name in [n for n in self._versions if n not in wanted and n != state.get("active")]:
+                del self._versions[name]
+            if state.get("active") in self._versions:
+                self._active = state["active"]
+            self._shadow = state.get("shadow") if state.get("shadow") in self._versions else None
+
+    def check(self) -> None:
+        """Reload versions whose files changed and apply the shared state file."""
+        if self.state_path:
+            try:
+                self._apply_state()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"WARNING: could not apply model registry state {self.state_path}: {e}")
+
+        with self._lock:
+            versions = [(v, self._resolvers.get(v.name)) for v in self._versions.values()]
+        for version, resolve in versions:
+            signature = version.current_signature()
+            if signature is None or signature == version.signature:
+                continue
+            try:
+                path = resolve() if resolve is not None else version.path
+                self.load(version.name, path, persist=False, watch=version.watch, resolve=resolve)
+                print(f"Reloaded model {version.name} from {path}")
+            except Exception as e:
+                # Half-written files: keep serving the old version and retry on the next check
+                print(f"WARNING: reloading model {version.name} failed, keeping the loaded one: {e}")
+
+    def _watch(self) -> None:
+        while True:
+            time.sleep(self.check_interval)
+            self.check()
+
+    def start_watching(self) -> None:
+        # Threads don't survive fork(), so every serve.py worker starts its own
+        if self.check_interval <= 0 or self._watcher_pid == os.getpid():
+            return
+        self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name="model-watcher", daemon=True).start()
@@ -0,0 +1,140 @@
+"""Pre-fork production server for the price model.
+
+The parent process imports app.py once (loading the model), binds the
+listening socket and forks the workers, so every worker shares the model
+memory copy-on-write instead of unpickling its own copy.
+
+    python serve.py --workers 4 --threads-per-worker 2 --port 8000
+
+Linux/macOS only (needs os.fork).
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+
+def parse_args() -> argparse.Namespace:
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Serve the price model with N forked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=cpus)
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=0,
+        help="LightGBM threads per worker (default: cpu count / workers)",
+    )
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.threads_per_worker <= 0:
+        args.threads_per_worker = max(1, cpus // args.workers)
+    return args
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app_module, sock: socket.socket, args: argparse.Namespace) -> None:
+    # Default signal handling again, uvicorn installs its own for shutdown
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    app_module.set_num_threads(args.threads_per_worker)
+
+    config = uvicorn.Config(app_module.app, log_level=args.log_level)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def spawn_worker(app_module, sock: socket.socket, args: argparse.Namespace) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app_module, sock, args)
+        except BaseException:
+            code = 1
+            raise
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main() -> None:
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs os.fork, use `uvicorn app:app` on this platform")
+
+    args = parse_args()
+
+    # Keep the parent single threaded: an OpenMP thread pool created before
+    # fork() is not usable in the children. Workers get their own count.
+    os.environ["ML_NUM_THREADS"] = "1"
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    import app as app_module
+
+    sock = bind_socket(args.host, args.port)
+
+    # Move everything loaded so far out of the GC's reach, so collections in
+    # the workers don't write to (and un-share) the model's pages.
+    gc.collect()
+    gc.freeze()
+
+    workers: set[int] = set()
+    stopping = False
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(args.workers):
+        workers.add(spawn_worker(app_module, sock, args))
+
+    print(
+        f"Serving on {args.host}:{args.port} with {args.workers} workers, "
+        f"{args.threads_per_worker} LightGBM thread(s) each"
+    )
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+
+        if not stopping:
+            # Replace crashed workers, but don't spin if they die on startup
+            print(f"Worker {pid} exited with status {status}, restarting")
+            time.sleep(1)
+            workers.add(spawn_worker(app_module, sock, args))
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
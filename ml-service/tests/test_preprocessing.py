@@ -0,0 +1,160 @@
+import random
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing import PREMIUM_KEYWORDS, VARIANTS, clean_model, extract_variant, map_color
+
+
+# Reference implementations, copied from CTC.ipynb
+
+# The notebook kept these in a set, whose iteration order changes with string
+# hash randomization; the pipeline pins the order of the list below, so a word
+# with two colors maps to the first of them here
+NOTEBOOK_BASE_COLORS = [
+    "black", "white", "gray", "silver", "red", "blue", "green",
+    "brown", "beige", "tan", "gold", "yellow", "orange", "purple",
+]
+
+def notebook_extract_variant(text):
+    if pd.isna(text):
+        return "other"
+
+    s = str(text).lower()
+    s = re.sub(r'[-/]', ' ', s)   # normalize separators, e.g. "XLE/SE"
+
+    for v in VARIANTS:
+        pattern = r"\b" + re.escape(v) + r"\b"
+        if re.search(pattern, s):
+            return v
+
+    return "other"
+
+
+def notebook_clean_model(text):
+    if pd.isna(text):
+        return "other"
+
+    s = str(text).lower()
+
+    # normalize separators
+    s = re.sub(r'[-/]', ' ', s)
+
+    # remove drivetrain tokens
+    s = re.sub(r"\b(awd|4wd|4x4|fwd|rwd)\b", " ", s)
+
+    # remove pure liter engine sizes (2.0L.)
+    s = re.sub(r"\b\d\.\d\s*l\b", " ", s)
+
+    # remove turbo/engine codes (2.0t)
+    s = re.sub(r"\b\d\.\d\s*t\b", " ", s)
+
+    # remove numeric engine sizes (2.0)
+    s = re.sub(r"\b\d\.\d\b", " ", s)
+
+    # remove short “engine codes” like 2l, 3l
+    s = re.sub(r"\b\d\s*l\b", " ", s)
+
+    # remove extra spaces
+    s = re.sub(r"\s+", " ", s).strip()
+
+    return s if s else "other"
+
+
+def notebook_map_color(raw):
+    if pd.isna(raw):
+        return "other"
+
+    s = str(raw).lower()
+
+    # If a premium keyword exists anywhere → premium
+    if any(pk in s for pk in PREMIUM_KEYWORDS):
+        return "premium"
+
+    # remove non-letters
+    s_clean = re.sub(r'[^a-z ]', ' ', s)
+    s_clean = re.sub(r'\s+', ' ', s_clean).strip()
+
+    # find base colors
+    for word in s_clean.split():
+        for base in NOTEBOOK_BASE_COLORS:
+            if base in word:
+                if base == "grey":
+                    return "gray"
+                if base == "tan":
+                    return "beige"
+                return base
+
+    return "other"
+
+
+MODEL_TOKENS = [
+    "Camry", "F-150", "Wrangler", "Sierra", "1500", "RAV4", "Accord", "CR-V", "Model", "3",
+    "Grand", "Cherokee", "Big", "Horn", "XLE", "SE", "LE", "Sport", "Limited", "AWD", "4WD",
+    "4x4", "FWD", "RWD", "2.0L", "3.5 L", "2.0T", "1.5t", "2.5", "2L", "3 l", "SR5", "1LT",
+    "Trailhawk", "Hybrid", "EX-L", "GT", "/", "-", "Platinum", "Denali", "Base", "s", "Xse",
+]
+
+COLOR_VALUES = [
+    "Black", "Super White", "Midnight Black Metallic", "Magnetic Gray", "Silver Sky",
+    "Ruby Red Pearl", "Blue Crush", "Tan", "Golden", "Dark Green 5", "Brown/Tan",
+    "Orange Fury", "Velvet Purple", "Unknown", "", "123", "Mica Blue", "Shadow", "Grey",
+    "yellow jacket", "Ice-white", "Beige;Gold", "Tinted Clearcoat", "N/A",
+    # Two colors in one word, the notebook picks by list order, not position
+    "silvergray", "redblack", "TanBlack", "Grayellow", "Dark bluewhite", "orangetan",
+]
+
+COLOR_TOKENS = [
+    "black", "white", "gray", "grey", "silver", "red", "blue", "green", "brown", "beige",
+    "tan", "gold", "yellow", "orange", "purple", "dark", "light", "ice", "ruby", "sky",
+    "met", "pearl", "x", "-", "/", " ", "5", "Midnight", "Storm",
+]
+
+
+def random_models(n):
+    rng = random.Random(42)
+    return [
+        " ".join(rng.choice(MODEL_TOKENS) for _ in range(rng.randint(1, 6)))
+        for _ in range(n)
+    ]
+
+
+def random_colors(n):
+    rng = random.Random(7)
+    return [
+        "".join(rng.choice(COLOR_TOKENS) for _ in range(rng.randint(1, 5)))
+        for _ in range(n)
+    ]
+
+
+def with_missing(values):
+    return pd.Series(values + [np.nan, None], dtype=object)
+
+
+@pytest.mark.parametrize(
+    "vectorized, reference, values",
+    [
+        (extract_variant, notebook_extract_variant, random_models(3000)),
+        (clean_model, notebook_clean_model, random_models(3000)),
+        (map_color, notebook_map_color, COLOR_VALUES + random_colors(3000)),
+    ],
+    ids=["extract_variant", "clean_model", "map_color"],
+)
+def test_matches_notebook(vectorized, reference, values):
+    series = with_missing(values)
+    expected = series.apply(reference)
+    actual = vectorized(series)
+
+    assert actual.index.equals(series.index)
+    assert actual.tolist() == expected.tolist()
+
+
+def test_repeated_values_keep_their_position():
+    series = pd.Series(["Camry XLE", "Camry LE", "Camry XLE", None, "Camry LE"], index=[5, 3, 9, 1, 0])
+    assert extract_variant(series).to_dict() == {5: "xle", 3: "le", 9: "xle", 1: "other", 0: "le"}
+
+
+def test_empty_series():
+    assert clean_model(pd.Series([], dtype=object)).empty
@@ -0,0 +1,433 @@
+"""Headless version of the CTC.ipynb training pipeline.
+
+    python train.py --data path/to/used_cars.csv
+
+Each stage (clean -> features -> train) caches its output under
+--cache-dir, keyed by a hash of the input file and the settings of that
+stage and every stage before it. Re-running with only a training
+parameter changed reuses the cleaned and engineered frames.
+
+--quantiles 0.1,0.9 also fits one quantile booster per level on the same
+encoded features; they are written next to --out and give the price band
+app.py returns with every prediction.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from lightgbm import LGBMRegressor
+from sklearn.compose import ColumnTransformer
+from sklearn.metrics import mean_absolute_error, mean_pinball_loss, mean_squared_error, r2_score
+from sklearn.model_selection import TimeSeriesSplit, cross_val_score
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+from inference import companion_quantile_path, find_quantile_files
+from preprocessing import (
+    clean_model,
+    extract_variant,
+    map_color,
+    map_drivetrain,
+    map_fuel_type,
+    map_transmission,
+    mpg_average,
+)
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model")
+DEFAULT_OUT = os.path.join(MODEL_DIR, "used_car_lgbm_pipeline.pkl")
+DEFAULT_CACHE_DIR = os.path.join(MODEL_DIR, ".train_cache")
+
+# Bump when the code of a stage changes so old cache entries are not reused
+STAGE_VERSIONS = {"clean": 1, "features": 2, "train": 1, "folds": 1}
+
+BOOL_COLS = ["accidents_or_damage", "one_owner", "personal_use_only"]
+
+DEFAULT_CLEAN_CONFIG = {
+    "price_quantiles": [0.02, 0.98],
+    "mileage_quantiles": [0.02, 0.98],
+    "min_year": 1980,
+    "drop_columns": [
+        "seller_name", "seller_rating", "price_drop", "driver_rating", "driver_reviews_num", "interior_color",
+    ],
+}
+
+DEFAULT_FEATURES_CONFIG = {
+    "min_model_count": 100,
+    "reference_year": 2023,
+}
+
+DEFAULT_LGBM_PARAMS = {
+    "objective": "regression",
+    "random_state": 42,
+    "n_estimators": 200,
+    "learning_rate": 0.05,
+    "num_leaves": 63,
+    "max_depth": -1,
+    "subsample": 0.8,
+    # LightGBM only bags rows when subsample_freq > 0, without it subsample is ignored
+    "subsample_freq": 1,
+    "colsample_bytree": 0.8,
+    "n_jobs": -1,
+}
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def stage_key(parent_key: str, stage: str, config: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"parent": parent_key, "stage": stage, "version": STAGE_VERSIONS[stage], "config": config},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class StageCache:
+    def __init__(self, cache_dir: str, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, stage: str, key: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, f"{stage}-{key[:16]}.{ext}")
+
+    def frame(self, stage: str, key: str, build: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        path = self.path(stage, key, "parquet")
+        if self.enabled and os.path.exists(path):
+            print(f"[{stage}] cached: {path}")
+            return pd.read_parquet(path)
+
+        started = time.perf_counter()
+        df = build()
+        print(f"[{stage}] built in {time.perf_counter() - started:.1f}s, shape {df.shape}")
+        if self.enabled:
+            # Write to a temp file first so an interrupted run never leaves a half-written entry
+            df.to_parquet(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+        return df
+
+
+def clean_dataset(df: pd.DataFrame, config: Dict[str, Any]) -> pd.DataFrame:
+    # 1. PRICE / 2. MILEAGE: percentile filters
+    p_low, p_high = df["price"].quantile(config["price_quantiles"])
+    df = df[(df["price"] >= p_low) & (df["price"] <= p_high)]
+
+    m_low, m_high = df["mileage"].quantile(config["mileage_quantiles"])
+    df = df[(df["mileage"] >= m_low) & (df["mileage"] <= m_high)]
+
+    # 3. YEAR outliers
+    df = df[df["year"] >= config["min_year"]].copy()
+
+    # 4. Manufacturer to lowercase
+    df["manufacturer"] = df["manufacturer"].str.lower().str.strip()
+
+    # 5. Drop columns that are not useful or have too many missing values
+    df = df.drop(columns=[c for c in config["drop_columns"] if c in df.columns])
+
+    # 6. MPG strings to a single numeric value (midpoint if range)
+    if "mpg" in df.columns:
+        df["mpg_avg"] = mpg_average(df["mpg"])
+        df = df.drop(columns=["mpg"])
+
+    # 7. Engine size in liters and horsepower from the engine text
+    if "engine" in df.columns:
+        df["engine_size_l"] = pd.to_numeric(df["engine"].str.extract(r"(\d\.\d)")[0], errors="coerce")
+        df["hp"] = pd.to_numeric(df["engine"].str.extract(r"(\d+)\s*HP", flags=re.IGNORECASE)[0], errors="coerce")
+        df = df.drop(columns=["engine"])
+
+    df = df[(df["engine_size_l"].notna()) & (df["engine_size_l"] != 0.0)]
+
+    # 8. Exterior color textual noise
+    if "exterior_color" in df.columns:
+        df["exterior_color"] = (
+            df["exterior_color"]
+            .astype(str)
+            .str.lower()
+            .str.strip()
+            .str.replace(r"[^a-z\s]", "", regex=True)
+            .str.replace(r"\s+", " ", regex=True)
+        )
+
+    # 9. Numeric columns filled with their median
+    numeric_cols = df.select_dtypes(include=["float64", "int64"]).columns
+    df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].median())
+
+    return df
+
+
+def engineer_dataset(df: pd.DataFrame, config: Dict[str, Any]) -> pd.DataFrame:
+    df = df.copy()
+
+    df["fuel_type"] = map_fuel_type(df["fuel_type"])
+    df["transmission"] = map_transmission(df["transmission"])
+    df["drivetrain"] = map_drivetrain(df["drivetrain"])
+    df["exterior_color"] = map_color(df["exterior_color"])
+
+    df["model_variant"] = extract_variant(df["model"])
+    df["model"] = clean_model(df["model"])
+
+    model_counts = df["model"].value_counts()
+    rare_models = model_counts[model_counts < config["min_model_count"]].index
+    df["model"] = df["model"].where(~df["model"].isin(rare_models), "other")
+
+    df["car_age"] = config["reference_year"] - df["year"]
+    engine_str = df["engine_size_l"].astype(str)
+    df["model_engine"] = df["model"] + "_" + engine_str
+    df["model_drivetrain"] = df["model"] + "_" + df["drivetrain"].astype(str)
+    df["model_full"] = df["model"] + "_" + engine_str + "_" + df["drivetrain"].astype(str)
+
+    return df
+
+
+def split_features(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series, List[str], List[str]]:
+    df = df.copy()
+
+    # Boolean types set as categories
+    for col in BOOL_COLS:
+        if col in df.columns:
+            df[col] = df[col].fillna(0).astype(int).astype("category")
+
+    X = df.drop(columns=["price"])
+    y = df["price"]
+
+    numeric_cols = [
+        c for c in X.columns
+        if pd.api.types.is_numeric_dtype(X[c]) and not isinstance(X[c].dtype, pd.CategoricalDtype)
+    ]
+    categorical_cols = [c for c in X.columns if c not in numeric_cols]
+    for col in categorical_cols:
+        if not isinstance(X[col].dtype, pd.CategoricalDtype):
+            X[col] = X[col].astype(object)
+
+    return X, y, categorical_cols, numeric_cols
+
+
+def build_preprocessor(categorical_cols: List[str], numeric_cols: List[str]) -> ColumnTransformer:
+    # One-hot encoding
+    return ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_cols),
+            ("num", "passthrough", numeric_cols),
+        ]
+    )
+
+
+def build_lgbm_pipeline(categorical_cols: List[str], numeric_cols: List[str], params: Dict[str, Any]) -> Pipeline:
+    return Pipeline(steps=[
+        ("preprocess", build_preprocessor(categorical_cols, numeric_cols)),
+        ("lgbm", LGBMRegressor(**params)),
+    ])
+
+
+def time_split(X: pd.DataFrame, y: pd.Series, test_fraction: float):
+    # Time based train/test split, the last rows are the test set
+    test_size = int(len(X) * test_fraction)
+    return X.iloc[:-test_size], y.iloc[:-test_size], X.iloc[-test_size:], y.iloc[-test_size:]
+
+
+def regression_metrics(y_true, y_pred) -> Dict[str, float]:
+    mse = mean_squared_error(y_true, y_pred)
+    return {
+        "mae": float(mean_absolute_error(y_true, y_pred)),
+        "mse": float(mse),
+        "rmse": float(np.sqrt(mse)),
+        "r2": float(r2_score(y_true, y_pred)),
+    }
+
+
+def train_quantiles(
+    pipeline: Pipeline,
+    X_train: pd.DataFrame,
+    y_train: pd.Series,
+    X_test: pd.DataFrame,
+    y_test: pd.Series,
+    params: Dict[str, Any],
+    quantiles: List[float],
+):
+    # Quantile boosters reuse the fitted encoder, so serving encodes a row once for all of them
+    preprocess = pipeline[:-1]
+    encoded_train = preprocess.transform(X_train)
+    encoded_test = preprocess.transform(X_test)
+
+    models: Dict[float, LGBMRegressor] = {}
+    preds: Dict[float, np.ndarray] = {}
+    metrics: Dict[str, Any] = {}
+    for q in quantiles:
+        model = LGBMRegressor(**{**params, "objective": "quantile", "alpha": q})
+        model.fit(encoded_train, y_train)
+        models[q] = model
+        preds[q] = model.predict(encoded_test)
+        metrics[f"pinball_{q:g}"] = float(mean_pinball_loss(y_test, preds[q], alpha=q))
+
+    if len(quantiles) > 1:
+        low, high = preds[min(quantiles)], preds[max(quantiles)]
+        metrics["coverage"] = float(np.mean((y_test >= low) & (y_test <= high)))
+        metrics["expected_coverage"] = float(max(quantiles) - min(quantiles))
+        metrics["mean_width"] = float(np.mean(high - low))
+
+    return models, metrics
+
+
+def train_model(
+    df: pd.DataFrame,
+    params: Dict[str, Any],
+    test_fraction: float,
+    cv_splits: int,
+    quantiles: Optional[List[float]] = None,
+):
+    X, y, categorical_cols, numeric_cols = split_features(df)
+    X_train, y_train, X_test, y_test = time_split(X, y, test_fraction)
+    print(f"Train size: {len(X_train)}, Test size: {len(X_test)}")
+
+    pipeline = build_lgbm_pipeline(categorical_cols, numeric_cols, params)
+    pipeline.fit(X_train, y_train)
+
+    metrics = {"test": regression_metrics(y_test, pipeline.predict(X_test))}
+    baseline = np.full(shape=y_test.shape, fill_value=y_train.mean())
+    metrics["baseline"] = regression_metrics(y_test, baseline)
+
+    if cv_splits > 1:
+        cv = TimeSeriesSplit(n_splits=cv_splits)
+        scores = cross_val_score(
+            build_lgbm_pipeline(categorical_cols, numeric_cols, params), X_train, y_train, cv=cv, scoring="r2"
+        )
+        metrics["cv_r2"] = [float(s) for s in scores]
+
+    quantile_models: Dict[float, LGBMRegressor] = {}
+    if quantiles:
+        quantile_models, metrics["interval"] = train_quantiles(
+            pipeline, X_train, y_train, X_test, y_test, params, quantiles
+        )
+
+    return pipeline, metrics, quantile_models
+
+
+def parse_param(value: str) -> Tuple[str, Any]:
+    key, _, raw = value.partition("=")
+    if not key or not raw:
+        raise argparse.ArgumentTypeError(f"expected key=value, got {value!r}")
+    try:
+        return key, json.loads(raw)
+    except json.JSONDecodeError:
+        return key, raw
+
+
+def parse_quantiles(value: str) -> List[float]:
+    try:
+        quantiles = sorted({float(q) for q in value.split(",") if q.strip()})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma separated quantiles, got {value!r}")
+    if any(not 0 < q < 1 for q in quantiles):
+        raise argparse.ArgumentTypeError(f"quantiles must be between 0 and 1, got {value!r}")
+    return quantiles
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Train the used car price LightGBM pipeline")
+    parser.add_argument("--data", required=True, help="Path to the used cars CSV (Kaggle andreinovikov/used-cars-dataset)")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="Where to write the trained pipeline")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true", help="Rebuild every stage and don't write the cache")
+    parser.add_argument("--test-fraction", type=float, default=0.10)
+    parser.add_argument("--cv-splits", type=int, default=0, help="TimeSeriesSplit folds for CV R², 0 to skip")
+    parser.add_argument("--min-model-count", type=int, default=DEFAULT_FEATURES_CONFIG["min_model_count"])
+    parser.add_argument("--reference-year", type=int, default=DEFAULT_FEATURES_CONFIG["reference_year"])
+    parser.add_argument(
+        "--param",
+        action="append",
+        type=parse_param,
+        default=[],
+        metavar="KEY=VALUE",
+        help="Override a LightGBM parameter, e.g. --param num_leaves=127 (repeatable)",
+    )
+    parser.add_argument(
+        "--quantiles",
+        type=parse_quantiles,
+        default=[],
+        metavar="Q,Q",
+        help="Also train quantile boosters for a price band, e.g. --quantiles 0.1,0.9",
+    )
+    return parser.parse_args(argv)
+
+
+def run_stages(args: argparse.Namespace, cache: StageCache) -> Tuple[str, pd.DataFrame]:
+    # Shared by the training and tuning CLIs: cleaned + engineered frame and its cache key
+    data_key = file_digest(args.data)
+
+    clean_config = dict(DEFAULT_CLEAN_CONFIG)
+    clean_key = stage_key(data_key, "clean", clean_config)
+    cleaned = cache.frame("clean", clean_key, lambda: clean_dataset(pd.read_csv(args.data), clean_config))
+
+    features_config = {"min_model_count": args.min_model_count, "reference_year": args.reference_year}
+    features_key = stage_key(clean_key, "features", features_config)
+    engineered = cache.frame("features", features_key, lambda: engineer_dataset(cleaned, features_config))
+
+    return features_key, engineered
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    cache = StageCache(args.cache_dir, enabled=not args.no_cache)
+
+    features_key, engineered = run_stages(args, cache)
+
+    params = {**DEFAULT_LGBM_PARAMS, **dict(args.param)}
+    train_config = {"params": params, "test_fraction": args.test_fraction, "cv_splits": args.cv_splits}
+    if args.quantiles:
+        train_config["quantiles"] = args.quantiles
+    train_key = stage_key(features_key, "train", train_config)
+    model_path = cache.path("train", train_key, "pkl")
+    metrics_path = cache.path("train", train_key, "json")
+    cached_files = [model_path, metrics_path] + [companion_quantile_path(model_path, q) for q in args.quantiles]
+
+    if cache.enabled and all(os.path.exists(path) for path in cached_files):
+        print(f"[train] cached: {model_path}")
+        with open(metrics_path, "r", encoding="utf-8") as f:
+            metrics = json.load(f)
+    else:
+        started = time.perf_counter()
+        pipeline, metrics, quantile_models = train_model(
+            engineered, params, args.test_fraction, args.cv_splits, args.quantiles
+        )
+        print(f"[train] fitted in {time.perf_counter() - started:.1f}s")
+        if not cache.enabled:
+            model_path = args.out
+        for q, model in quantile_models.items():
+            model.booster_.save_model(companion_quantile_path(model_path, q))
+        if cache.enabled:
+            joblib.dump(pipeline, model_path + ".tmp")
+            os.replace(model_path + ".tmp", model_path)
+            with open(metrics_path, "w", encoding="utf-8") as f:
+                json.dump(metrics, f, indent=2)
+        else:
+            joblib.dump(pipeline, model_path)
+
+    # Boosters left from an earlier run would be served with the new pipeline
+    for q, path in find_quantile_files(args.out).items():
+        if q not in args.quantiles:
+            os.remove(path)
+    if os.path.abspath(model_path) != os.path.abspath(args.out):
+        for q in args.quantiles:
+            shutil.copyfile(companion_quantile_path(model_path, q), companion_quantile_path(args.out, q))
+        shutil.copyfile(model_path, args.out)
+
+    print(json.dumps(metrics, indent=2))
+    print(f"Saved model to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
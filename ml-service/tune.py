@@ -0,0 +1,215 @@
+"""Parallel hyperparameter search for the LightGBM pipeline.
+
+    python tune.py --data path/to/used_cars.csv --workers 4
+
+The one-hot encoder is fitted once per TimeSeriesSplit fold and the encoded
+sparse matrices are cached next to the train.py stage cache. Every
+parameter set is then trained on those matrices in a process pool, with
+early stopping on the fold's validation part, and the results are written
+to a CSV sorted by mean validation R².
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.model_selection import TimeSeriesSplit
+
+from train import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_FEATURES_CONFIG,
+    DEFAULT_LGBM_PARAMS,
+    StageCache,
+    build_preprocessor,
+    regression_metrics,
+    run_stages,
+    split_features,
+    stage_key,
+    time_split,
+)
+
+DEFAULT_GRID = {
+    "learning_rate": [0.03, 0.05, 0.1],
+    "num_leaves": [31, 63, 127],
+    "min_child_samples": [10, 20, 50],
+    "subsample": [0.8, 1.0],
+    "colsample_bytree": [0.6, 0.8],
+    "reg_lambda": [0.0, 1.0],
+}
+
+# Fold matrices, loaded once per worker process by _init_worker
+_FOLDS: List[Tuple[sp.csr_matrix, np.ndarray, sp.csr_matrix, np.ndarray]] = []
+
+
+def fold_paths(cache_dir: str, key: str, fold: int) -> Dict[str, str]:
+    prefix = os.path.join(cache_dir, f"folds-{key[:16]}-{fold}")
+    return {
+        "X_train": prefix + "-X_train.npz",
+        "y_train": prefix + "-y_train.npy",
+        "X_val": prefix + "-X_val.npz",
+        "y_val": prefix + "-y_val.npy",
+    }
+
+
+def build_folds(
+    X: pd.DataFrame,
+    y: pd.Series,
+    categorical_cols: List[str],
+    numeric_cols: List[str],
+    n_splits: int,
+    cache_dir: str,
+    key: str,
+    rebuild: bool = False,
+) -> List[Dict[str, str]]:
+    """Encode every CV fold once and store it as .npz/.npy, returns the file paths."""
+    folds = []
+    for fold, (train_idx, val_idx) in enumerate(TimeSeriesSplit(n_splits=n_splits).split(X)):
+        paths = fold_paths(cache_dir, key, fold)
+        folds.append(paths)
+        if not rebuild and all(os.path.exists(p) for p in paths.values()):
+            print(f"[folds] cached: fold {fold}")
+            continue
+
+        started = time.perf_counter()
+        # Fitted on the fold's train part only, so unseen categories behave like at prediction time
+        preprocessor = build_preprocessor(categorical_cols, numeric_cols)
+        X_train = sp.csr_matrix(preprocessor.fit_transform(X.iloc[train_idx]), dtype=np.float64)
+        X_val = sp.csr_matrix(preprocessor.transform(X.iloc[val_idx]), dtype=np.float64)
+
+        sp.save_npz(paths["X_train"], X_train)
+        sp.save_npz(paths["X_val"], X_val)
+        np.save(paths["y_train"], y.iloc[train_idx].to_numpy(dtype=np.float64))
+        np.save(paths["y_val"], y.iloc[val_idx].to_numpy(dtype=np.float64))
+        print(
+            f"[folds] fold {fold}: {X_train.shape[0]} train / {X_val.shape[0]} val rows, "
+            f"{X_train.shape[1]} features, encoded in {time.perf_counter() - started:.1f}s"
+        )
+    return folds
+
+
+def _init_worker(folds: List[Dict[str, str]]) -> None:
+    global _FOLDS
+    _FOLDS = [
+        (sp.load_npz(p["X_train"]), np.load(p["y_train"]), sp.load_npz(p["X_val"]), np.load(p["y_val"]))
+        for p in folds
+    ]
+
+
+def evaluate(params: Dict[str, Any], early_stopping_rounds: int) -> Dict[str, Any]:
+    # Runs in a worker process
+    from lightgbm import LGBMRegressor, early_stopping
+
+    started = time.perf_counter()
+    scores = []
+    for X_train, y_train, X_val, y_val in _FOLDS:
+        model = LGBMRegressor(**params)
+        model.fit(
+            X_train,
+            y_train,
+            eval_set=[(X_val, y_val)],
+            callbacks=[early_stopping(early_stopping_rounds, verbose=False)],
+        )
+        metrics = regression_metrics(y_val, model.predict(X_val, num_iteration=model.best_iteration_))
+        metrics["best_iteration"] = model.best_iteration_ or params["n_estimators"]
+        scores.append(metrics)
+
+    result = {name: float(np.mean([s[name] for s in scores])) for name in ("r2", "rmse", "mae")}
+    result["r2_std"] = float(np.std([s["r2"] for s in scores]))
+    result["best_iteration"] = int(round(np.mean([s["best_iteration"] for s in scores])))
+    result["seconds"] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def candidates(grid: Dict[str, List[Any]], max_candidates: int, seed: int) -> List[Dict[str, Any]]:
+    keys = sorted(grid)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    if max_candidates and len(combos) > max_candidates:
+        combos = random.Random(seed).sample(combos, max_candidates)
+    return combos
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Hyperparameter search for the LightGBM pipeline")
+    parser.add_argument("--data", required=True, help="Path to the used cars CSV")
+    parser.add_argument("--grid", help="JSON file with {param: [values, ...]}, default: a built-in grid")
+    parser.add_argument("--max-candidates", type=int, default=50, help="Random sample of the grid, 0 for all")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cv-splits", type=int, default=3)
+    parser.add_argument("--test-fraction", type=float, default=0.10, help="Held out like in train.py, never tuned on")
+    parser.add_argument("--n-estimators", type=int, default=2000, help="Upper bound, early stopping picks the count")
+    parser.add_argument("--early-stopping", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=cpus)
+    parser.add_argument("--threads-per-worker", type=int, default=0, help="LightGBM threads per candidate (default: cpu count / workers)")
+    parser.add_argument("--min-model-count", type=int, default=DEFAULT_FEATURES_CONFIG["min_model_count"])
+    parser.add_argument("--reference-year", type=int, default=DEFAULT_FEATURES_CONFIG["reference_year"])
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--out", default="tuning_results.csv")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.threads_per_worker <= 0:
+        args.threads_per_worker = max(1, cpus // args.workers)
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    cache = StageCache(args.cache_dir, enabled=not args.no_cache)
+    # Fold matrices are handed to the workers as files, so they are written even with --no-cache
+    os.makedirs(args.cache_dir, exist_ok=True)
+
+    features_key, engineered = run_stages(args, cache)
+
+    X, y, categorical_cols, numeric_cols = split_features(engineered)
+    X_train, y_train, _, _ = time_split(X, y, args.test_fraction)
+    folds_key = stage_key(features_key, "folds", {"cv_splits": args.cv_splits, "test_fraction": args.test_fraction})
+    folds = build_folds(
+        X_train, y_train, categorical_cols, numeric_cols, args.cv_splits, args.cache_dir, folds_key, rebuild=args.no_cache
+    )
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid, "r", encoding="utf-8") as f:
+            grid = json.load(f)
+
+    base = {**DEFAULT_LGBM_PARAMS, "n_estimators": args.n_estimators, "n_jobs": args.threads_per_worker, "verbose": -1}
+    combos = candidates(grid, args.max_candidates, args.seed)
+    print(f"Evaluating {len(combos)} candidates on {args.workers} workers x {args.threads_per_worker} thread(s)")
+
+    rows = []
+    started = time.perf_counter()
+    # spawn, not fork: LightGBM's OpenMP pool must not be inherited by the workers
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(args.workers, mp_context=ctx, initializer=_init_worker, initargs=(folds,)) as pool:
+        futures = {pool.submit(evaluate, {**base, **combo}, args.early_stopping): combo for combo in combos}
+        for done, future in enumerate(as_completed(futures), start=1):
+            combo = futures[future]
+            result = future.result()
+            rows.append((combo, result))
+            print(f"[{done}/{len(combos)}] r2={result['r2']:.4f} rmse={result['rmse']:.0f} {combo}")
+
+    rows.sort(key=lambda row: row[1]["r2"], reverse=True)
+    results = pd.DataFrame([{**combo, **result} for combo, result in rows])
+    results.to_csv(args.out, index=False)
+    print(f"\nSearched {len(combos)} candidates in {time.perf_counter() - started:.1f}s, results in {args.out}")
+    print(results.head(10).to_string())
+
+    best_combo, best_result = rows[0]
+    best_params = {**best_combo, "n_estimators": best_result["best_iteration"]}
+    print("\nTrain the best candidate with:")
+    print(f"python train.py --data {args.data}" + "".join(f" --param {k}={json.dumps(v)}" for k, v in best_params.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+
+from common.blocking import FetchProfile
+from common.engine import EngineConfig
+from common.extract import PageSpec
+from common.ratelimit import RateConfig
+from common.site import Site
+
+SITE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+NAME_SELECTOR = '[data-e2e="car-make-model-variant"]'
+PRICE_SELECTOR = '[data-e2e="car-retail-price"]'
+DETAILS_FACT_ROW_SELECTOR = "tr.bas-MuiTableRow-root"
+EQUIPMENT_ITEM_SELECTOR = '[data-e2e="car-equipment-item"]'
+
+PAGE_SPEC = PageSpec(
+    name_selectors=(NAME_SELECTOR,),
+    price_selectors=(PRICE_SELECTOR,),
+    row_selector=DETAILS_FACT_ROW_SELECTOR,
+    row_key_selector="th",
+    row_value_selector="td",
+    item_selector=EQUIPMENT_ITEM_SELECTOR,
+)
+
+
+def parse_listing(data: dict, allowed_keys: set[str]) -> tuple[str | None, str | None, dict[str, object]]:
+    name = data["name"].replace("\n", " ") if data["name"] else None
+    price = data["price"]
+
+    attributes: dict[str, object] = {}
+    for k, v in data["rows"]:
+        if k and k in allowed_keys:
+            attributes[k] = v
+
+    equipment = {txt for txt in data["items"] if txt in allowed_keys}
+    if equipment:
+        attributes["Udstyr"] = sorted(equipment)
+
+    return name, price, attributes
+
+
+def translate_attributes(attrs: dict[str, object], da_to_en: dict[str, str]) -> dict[str, object]:
+    translated: dict[str, object] = {}
+
+    for da_key, value in attrs.items():
+        if da_key == "Udstyr" and isinstance(value, list):
+            translated_equipment: list[str] = []
+            for item in value:
+                if isinstance(item, str) and item in da_to_en:
+                    translated_equipment.append(da_to_en[item])
+                elif isinstance(item, str):
+                    translated_equipment.append(item)
+            translated["Equipment"] = sorted(set(translated_equipment))
+            continue
+
+        en_key = da_to_en.get(da_key)
+        if en_key:
+            translated[en_key] = value
+        else:
+            translated[da_key] = value
+
+    return translated
+
+
+def attribute_keys(data: dict) -> set[str]:
+    # Fact names and equipment items both map to attributes
+    return {k for k, _ in data["rows"] if k} | set(data["items"])
+
+
+SITE = Site(
+    name="bilbasen",
+    base_url="https://www.bilbasen.dk",
+    start_url="https://www.bilbasen.dk/brugt/bil?includeengroscvr=true&includeleasing=false",
+    listing_card_selector="article.Listing_listing__XwaYe",
+    listing_link_selector="a.Listing_link__6Z504",
+    next_page_selector='a[data-e2e="pagination-next"]',
+    page_spec=PAGE_SPEC,
+    parse_listing=parse_listing,
+    translate_attributes=translate_attributes,
+    attribute_keys=attribute_keys,
+    listings_db=os.path.join(SITE_DIR, "bilbasen_listings.db"),
+    attribute_keys_db=os.path.join(SITE_DIR, "bilbasen_attribute_keys.db"),
+    # Headless, without images/fonts/CSS/trackers; the fact table is rendered by
+    # the site's own scripts, which stay allowed
+    fetch_profile=FetchProfile(),
+    engine=EngineConfig(pages=4, rate=RateConfig(concurrency=2, max_concurrency=4)),
+    # The detail fields are in the server-rendered HTML, they show up right after commit
+    detail_timeout_ms=8000,
+)
@@ -0,0 +1,56 @@
+"""Content-addressed archive of raw detail-page HTML.
+
+Pages are stored gzipped under objects/<sha256[:2]>/<sha256>.html.gz, so an
+unchanged page is written once however often it is scraped. index.jsonl
+records which URL had which content when; extract_archive.py re-parses the
+archive offline when the selectors or the attribute mapping change.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Iterator
+
+
+class HtmlArchive:
+    def __init__(self, root: str):
+        self.root = root
+        self.index_file = os.path.join(root, "index.jsonl")
+        self._lock = threading.Lock()
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], sha256 + ".html.gz")
+
+    def put(self, url: str, html: str) -> str:
+        data = html.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, "wb", compresslevel=6) as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+        entry = {"url": url, "sha256": sha256, "fetched_at": time.time()}
+        with self._lock, open(self.index_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        return sha256
+
+    def get(self, sha256: str) -> str:
+        with gzip.open(self.path(sha256), "rb") as f:
+            return f.read().decode("utf-8")
+
+    def latest(self) -> Iterator[dict]:
+        """Newest index entry per URL."""
+        if not os.path.exists(self.index_file):
+            return iter(())
+        entries: dict[str, dict] = {}
+        with open(self.index_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry["url"]] = entry
+        return iter(entries.values())
@@ -0,0 +1,79 @@
+"""Headless fetch profile that aborts requests the scrapers never read.
+
+The listing scrapers only read text from the DOM, so images, media, fonts,
+stylesheets and analytics/ad scripts are aborted at the network layer. A
+site keeps what it needs to render its fact tables through allow_types and
+allow_urls.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+
+# Analytics, ad and tracking hosts (a host also matches its subdomains)
+TRACKER_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "facebook.net",
+    "hotjar.com",
+    "clarity.ms",
+    "bat.bing.com",
+    "criteo.com",
+    "criteo.net",
+    "adform.net",
+    "adnxs.com",
+    "gemius.pl",
+    "cxense.com",
+    "scorecardresearch.com",
+)
+
+
+def _host_matches(host: str, domains: tuple[str, ...]) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+@dataclass(frozen=True)
+class FetchProfile:
+    headless: bool = True
+    block_types: frozenset[str] = BLOCKED_RESOURCE_TYPES
+    block_hosts: tuple[str, ...] = TRACKER_HOSTS
+    # Per-site exceptions, checked before the block rules
+    allow_types: frozenset[str] = frozenset()
+    allow_urls: tuple[str, ...] = ()
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if resource_type in self.allow_types or any(part in url for part in self.allow_urls):
+            return False
+        if resource_type in self.block_types:
+            return True
+        return _host_matches(urlsplit(url).hostname or "", self.block_hosts)
+
+
+class RequestBlocker:
+    """Routes every request of a browser context through a FetchProfile."""
+
+    def __init__(self, profile: FetchProfile):
+        self.profile = profile
+        self.allowed = 0
+        self.blocked: Counter = Counter()
+
+    async def attach(self, context) -> None:
+        await context.route("**/*", self._route)
+
+    async def _route(self, route) -> None:
+        request = route.request
+        if self.profile.should_block(request.url, request.resource_type):
+            self.blocked[request.resource_type] += 1
+            await route.abort()
+        else:
+            self.allowed += 1
+            await route.continue_()
+
+    def summary(self) -> str:
+        total = self.allowed + sum(self.blocked.values())
+        by_type = ", ".join(f"{kind} {n}" for kind, n in self.blocked.most_common())
+        return f"Blocked {total - self.allowed}/{total} requests ({by_type or 'none'})"
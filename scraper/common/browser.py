@@ -0,0 +1,129 @@
+"""Page helpers shared by all sites, driven by the Site's selectors.
+
+The cookie banner is dismissed once per site and the browser storage state
+(cookies, localStorage) saved next to the site's DB; contexts started from
+it never see the banner, so the pages skip the per-page check.
+"""
+import asyncio
+import os
+import time
+
+from common.ratelimit import raise_for_status
+from common.site import Site
+
+
+async def sleep(seconds: float) -> None:
+    await asyncio.sleep(max(0.0, seconds))
+
+
+async def handle_cookies(page, site: Site) -> bool:
+    """Reject the cookie banner if it is showing, returns whether it was clicked away."""
+    modal = page.locator(site.cookie_modal_selector).first
+    try:
+        if not await modal.count() or not await modal.is_visible():
+            return False
+    except Exception:
+        return False
+
+    deadline = time.time() + 8
+    while time.time() < deadline:
+        for sel in site.cookie_reject_selectors:
+            btn = page.locator(sel).first
+            if await btn.count() and await btn.is_visible():
+                await btn.click(timeout=2000)
+                await sleep(1)
+                return True
+        await sleep(0.5)
+    return False
+
+
+def consent_state_fresh(site: Site) -> bool:
+    try:
+        age = time.time() - os.path.getmtime(site.storage_state_file)
+    except OSError:
+        return False
+    return age < site.consent_max_age_days * 24 * 3600
+
+
+async def load_consent_state(browser, site: Site, blocker=None) -> str | None:
+    """Storage state file with the cookie banner dismissed, made on first use.
+
+    None if the banner never showed up; pages then keep checking for it.
+    """
+    if consent_state_fresh(site):
+        return site.storage_state_file
+
+    context = await browser.new_context()
+    if blocker is not None:
+        await blocker.attach(context)
+    try:
+        page = await context.new_page()
+        await page.goto(site.start_url)
+        try:
+            # The consent script loads after the page, give it time to show the banner
+            await page.wait_for_selector(site.cookie_modal_selector, state="visible", timeout=site.consent_timeout_ms)
+        except Exception:
+            return None
+        if not await handle_cookies(page, site):
+            return None
+        tmp_path = site.storage_state_file + ".tmp"
+        await context.storage_state(path=tmp_path)
+        os.replace(tmp_path, site.storage_state_file)
+    finally:
+        await context.close()
+    print(f"Saved cookie consent state to: {site.storage_state_file}")
+    return site.storage_state_file
+
+
+async def collect_detail_links(page, site: Site) -> list[str]:
+    links: list[str] = []
+    cards = page.locator(site.listing_card_selector)
+
+    for i in range(await cards.count()):
+        card = cards.nth(i)
+        a = card.locator(site.listing_link_selector).first
+        href = await a.get_attribute("href")
+        if not href:
+            continue
+        links.append(site.absolute_url(href))
+
+    return links
+
+
+async def go_next_page(page, site: Site) -> bool:
+    next_btn = page.locator(site.next_page_selector).first
+    if not await next_btn.count() or not await next_btn.is_visible():
+        return False
+
+    href = await next_btn.get_attribute("href")
+    if not href:
+        return False
+
+    await navigate(page, site.absolute_url(href))
+    await page.wait_for_selector(site.listing_card_selector, timeout=site.search_timeout_ms)
+    return True
+
+
+async def navigate(page, url: str) -> None:
+    """Go to url, returning as soon as the response starts, not on a load event.
+
+    Ad-heavy pages take seconds to fire load; callers wait for the elements
+    they need instead.
+    """
+    response = await page.goto(url, wait_until="commit")
+    if response is not None:
+        raise_for_status(url, response.status, response.headers)
+
+
+async def open_search(page, site: Site, dismiss_cookies: bool = True) -> None:
+    await navigate(page, site.start_url)
+    await page.wait_for_selector(site.listing_card_selector, timeout=site.search_timeout_ms)
+    if dismiss_cookies:
+        await handle_cookies(page, site)
+
+
+async def open_detail(page, site: Site, link: str) -> None:
+    # The fetcher then waits for the PageSpec's required fields. A cookie
+    # banner is handled after that (Fetcher on_ready): right after commit
+    # there is no DOM to find it in yet
+    await navigate(page, link)
@@ -0,0 +1,219 @@
+"""Async Playwright engine shared by the listing scrapers.
+
+A pool of pages, each in its own browser context, drains a bounded queue of
+detail URLs. Every page waits on the network independently, so a run takes
+roughly the time of the slowest 1/N of the pages instead of all of them in a
+row. An adaptive per-host rate limiter (common/ratelimit.py) paces the pages
+hitting the same site. A failed URL goes back in the queue after an
+exponential backoff, until it runs out of attempts.
+
+The URLs can come from an async generator, e.g. one paging through search
+results: workers start on the first links while later search pages load,
+and a full queue pauses the generator until they catch up.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable
+
+from common.blocking import RequestBlocker
+from common.ratelimit import HttpStatusError, RateConfig, RateLimiter, backoff_delay
+
+
+@dataclass
+class EngineConfig:
+    # Pages (and browser contexts) working in parallel
+    pages: int = 4
+    # Per-host pacing, keeps us polite to a single site
+    rate: RateConfig = field(default_factory=RateConfig)
+    # URLs buffered ahead of the workers
+    queue_size: int = 50
+    # Tries per URL before it is given up on
+    max_attempts: int = 3
+    # Seconds before the first retry, doubled for every further one
+    retry_backoff: float = 5.0
+    max_backoff: float = 120.0
+
+
+@dataclass
+class ScrapeStats:
+    done: int = 0
+    failed: int = 0
+    retried: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def summary(self) -> str:
+        total = self.done + self.failed
+        rate = total / self.seconds if self.seconds else 0.0
+        return (
+            f"{self.done} scraped, {self.failed} failed ({self.retried} retries) "
+            f"in {self.seconds:.1f}s ({rate:.2f} pages/s)"
+        )
+
+
+Visit = Callable[[object, str], Awaitable[None]]
+# Called with a URL and its last error once it is out of attempts
+GiveUp = Callable[[str, Exception], None]
+
+
+async def _as_async(urls: Iterable[str]) -> AsyncIterator[str]:
+    for url in urls:
+        yield url
+
+
+class PagePool:
+    """One page per browser context, so pages don't share a renderer process."""
+
+    def __init__(self, browser, size: int, blocker: RequestBlocker | None = None, **context_options):
+        self.browser = browser
+        self.size = size
+        self.blocker = blocker
+        self.context_options = context_options
+        self.contexts: list = []
+        self.pages: list = []
+
+    async def new_context(self):
+        context = await self.browser.new_context(**self.context_options)
+        if self.blocker is not None:
+            await self.blocker.attach(context)
+        self.contexts.append(context)
+        return context
+
+    async def __aenter__(self) -> "PagePool":
+        for _ in range(self.size):
+            context = await self.new_context()
+            self.pages.append(await context.new_page())
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        for context in self.contexts:
+            await context.close()
+        self.contexts.clear()
+        self.pages.clear()
+
+
+def _retryable(error: Exception) -> bool:
+    # A missing listing stays missing, anything else may be transient
+    return not isinstance(error, HttpStatusError) or error.retryable
+
+
+async def scrape(
+    pool: PagePool,
+    urls: Iterable[str] | AsyncIterable[str],
+    visit: Visit,
+    config: EngineConfig,
+    limit: int | None = None,
+    limiter: RateLimiter | None = None,
+    on_give_up: GiveUp | None = None,
+) -> ScrapeStats:
+    """Run visit(page, url) for every URL on the pool's pages, at most limit of them.
+
+    A failing URL is logged and queued again after a backoff, up to
+    config.max_attempts tries; then it is counted as failed and passed to
+    on_give_up. Once limit URLs are queued the source is closed, so a
+    generator stops paging.
+    """
+    if isinstance(urls, AsyncIterable):
+        source = urls
+        total = limit
+    else:
+        urls = list(urls)
+        source = _as_async(urls)
+        total = min(len(urls), limit) if limit is not None else len(urls)
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=config.queue_size)
+    limiter = limiter or RateLimiter(config.rate)
+    stats = ScrapeStats()
+    started = 0
+    # URLs queued, being visited or waiting for a retry; the run ends at 0
+    unfinished = 0
+    source_done = False
+    finished = asyncio.Event()
+    retries: set[asyncio.Task] = set()
+
+    def finish_one() -> None:
+        nonlocal unfinished
+        unfinished -= 1
+        if source_done and not unfinished:
+            finished.set()
+
+    async def produce() -> None:
+        nonlocal unfinished, source_done
+        queued = 0
+        seen: set[str] = set()
+        try:
+            async for url in source:
+                if url in seen:
+                    continue
+                seen.add(url)
+                unfinished += 1
+                # Blocks while the queue is full, which pauses the source
+                await queue.put((url, 1))
+                queued += 1
+                if limit is not None and queued >= limit:
+                    break
+        except Exception as e:
+            print(f"  ERROR: Link discovery stopped: {e}")
+        finally:
+            if hasattr(source, "aclose"):
+                await source.aclose()
+            source_done = True
+            if not unfinished:
+                finished.set()
+            # Retries are still coming back into the queue until this is set
+            await finished.wait()
+            for _ in pool.pages:
+                await queue.put(None)
+
+    async def retry_later(url: str, attempt: int, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await queue.put((url, attempt))
+
+    async def work(page) -> None:
+        nonlocal started
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            url, attempt = item
+            throttle = limiter(url)
+            await throttle.acquire()
+            if attempt == 1:
+                started += 1
+                print(f"[{started}/{total or '?'}] {url}")
+            else:
+                print(f"[retry {attempt}/{config.max_attempts}] {url}")
+            t0 = time.perf_counter()
+            error = None
+            try:
+                await visit(page, url)
+                stats.done += 1
+            except Exception as e:
+                error = e
+            await throttle.release(time.perf_counter() - t0, error)
+            if error is None:
+                finish_one()
+                continue
+
+            if attempt < config.max_attempts and _retryable(error):
+                retry_after = getattr(error, "retry_after", None)
+                delay = backoff_delay(attempt, config.retry_backoff, config.max_backoff, retry_after)
+                print(f"  ERROR: Failed to scrape {url}: {error} (retrying in {delay:.1f}s)")
+                stats.retried += 1
+                task = asyncio.create_task(retry_later(url, attempt + 1, delay))
+                retries.add(task)
+                task.add_done_callback(retries.discard)
+                continue
+
+            stats.failed += 1
+            print(f"  ERROR: Failed to scrape {url}: {error} (giving up after {attempt} attempts)")
+            if on_give_up is not None:
+                on_give_up(url, error)
+            finish_one()
+
+    await asyncio.gather(produce(), *(work(page) for page in pool.pages))
+    return stats
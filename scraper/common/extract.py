@@ -0,0 +1,208 @@
+"""Single round-trip DOM extraction for detail pages.
+
+Reading a page through locators costs a browser round-trip per count(),
+inner_text() and nth() call, hundreds per listing. extract_page runs one
+script in the page instead and returns everything as plain JSON; filtering
+against the attribute keys happens in Python afterwards.
+
+wait_for_data polls the same script until the spec's required fields are
+on the page, so navigation doesn't have to wait for any load event.
+
+extract_html returns the same structure from saved HTML with BeautifulSoup,
+for re-extracting the archive and for pages fetched without a browser. It
+falls back to the page's JSON-LD for the name and price.
+"""
+import json
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PageSpec:
+    """Where a site keeps the fields of a detail page (plain CSS selectors)."""
+
+    # Candidates in order of preference, the first element with text wins
+    name_selectors: tuple[str, ...]
+    price_selectors: tuple[str, ...]
+    # Fact rows and the key/value element inside each row
+    row_selector: str
+    row_key_selector: str
+    row_value_selector: str
+    # Flat list items, e.g. equipment
+    item_selector: str | None = None
+    # Only take the price from a visible element
+    price_must_be_visible: bool = False
+    # Fields that must be non-empty for a page to count as extracted
+    required: tuple[str, ...] = ("name", "price", "rows")
+
+
+def missing_fields(data: dict, spec: PageSpec) -> list[str]:
+    return [field for field in spec.required if not data.get(field)]
+
+
+EXTRACT_JS = """
+(spec) => {
+  const text = (el) => ((el && el.innerText) || "").trim();
+  const visible = (el) => {
+    const rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== "hidden";
+  };
+  const first = (selectors, mustBeVisible) => {
+    for (const sel of selectors) {
+      const el = document.querySelector(sel);
+      if (!el || (mustBeVisible && !visible(el))) continue;
+      const value = text(el);
+      if (value) return value;
+    }
+    return null;
+  };
+
+  const rows = [];
+  for (const row of document.querySelectorAll(spec.row_selector)) {
+    const key = row.querySelector(spec.row_key_selector);
+    const value = row.querySelector(spec.row_value_selector);
+    if (key && value) rows.push([text(key), text(value)]);
+  }
+
+  const items = spec.item_selector
+    ? Array.from(document.querySelectorAll(spec.item_selector), text).filter(Boolean)
+    : [];
+
+  return {
+    name: first(spec.name_selectors, false),
+    price: first(spec.price_selectors, spec.price_must_be_visible),
+    rows: rows,
+    items: items,
+  };
+}
+"""
+
+
+# The extraction once every required field is non-empty, null before that
+READY_JS = f"""
+(spec) => {{
+  const data = ({EXTRACT_JS.strip()})(spec);
+  const present = (value) => Array.isArray(value) ? value.length > 0 : Boolean(value);
+  return spec.required.every((field) => present(data[field])) ? data : null;
+}}
+"""
+
+
+def _spec_arg(spec: PageSpec) -> dict:
+    return {
+        "name_selectors": list(spec.name_selectors),
+        "price_selectors": list(spec.price_selectors),
+        "row_selector": spec.row_selector,
+        "row_key_selector": spec.row_key_selector,
+        "row_value_selector": spec.row_value_selector,
+        "item_selector": spec.item_selector,
+        "price_must_be_visible": spec.price_must_be_visible,
+        "required": list(spec.required),
+    }
+
+
+async def extract_page(page, spec: PageSpec) -> dict:
+    """Name, price, [[key, value], ...] fact rows and items of the current page."""
+    return await page.evaluate(EXTRACT_JS, _spec_arg(spec))
+
+
+async def wait_for_data(page, spec: PageSpec, timeout_ms: float, polling_ms: int = 100) -> dict | None:
+    """extract_page as soon as the required fields are present, None after timeout_ms."""
+    try:
+        handle = await page.wait_for_function(READY_JS, arg=_spec_arg(spec), polling=polling_ms, timeout=timeout_ms)
+    except Exception:
+        return None
+    return await handle.json_value()
+
+
+def _text(el) -> str:
+    # Whitespace-collapsed text, close to innerText for the short fields we read
+    return " ".join(el.get_text(" ").split()) if el is not None else ""
+
+
+def _hidden(el) -> bool:
+    # No CSS offline, only what the markup itself says
+    style = (el.get("style") or "").replace(" ", "").lower()
+    return el.has_attr("hidden") or el.get("aria-hidden") == "true" or "display:none" in style
+
+
+def extract_html(html: str, spec: PageSpec) -> dict:
+    """extract_page for raw HTML, parsed with BeautifulSoup (lxml when installed)."""
+    from bs4 import BeautifulSoup, FeatureNotFound
+
+    try:
+        soup = BeautifulSoup(html, "lxml")
+    except FeatureNotFound:
+        soup = BeautifulSoup(html, "html.parser")
+
+    def first(selectors: tuple[str, ...], must_be_visible: bool) -> str | None:
+        for sel in selectors:
+            el = soup.select_one(sel)
+            if el is None or (must_be_visible and _hidden(el)):
+                continue
+            value = _text(el)
+            if value:
+                return value
+        return None
+
+    rows = []
+    for row in soup.select(spec.row_selector):
+        key = row.select_one(spec.row_key_selector)
+        value = row.select_one(spec.row_value_selector)
+        if key is not None and value is not None:
+            rows.append([_text(key), _text(value)])
+
+    items = [_text(el) for el in soup.select(spec.item_selector)] if spec.item_selector else []
+
+    name = first(spec.name_selectors, False)
+    price = first(spec.price_selectors, spec.price_must_be_visible)
+    if not name or not price:
+        ld_name, ld_price = _json_ld_offer(soup)
+        name = name or ld_name
+        price = price or ld_price
+
+    return {
+        "name": name,
+        "price": price,
+        "rows": rows,
+        "items": [t for t in items if t],
+    }
+
+
+def _json_ld_offer(soup) -> tuple[str | None, str | None]:
+    """Name and price of the first Car/Vehicle/Product in the page's JSON-LD."""
+    for script in soup.select('script[type="application/ld+json"]'):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+
+        if isinstance(data, dict):
+            nodes = data.get("@graph", [data])
+        elif isinstance(data, list):
+            nodes = data
+        else:
+            continue
+
+        for node in nodes:
+            if not isinstance(node, dict):
+                continue
+            kinds = node.get("@type")
+            if not isinstance(kinds, list):
+                kinds = [kinds]
+            if not {"Car", "Vehicle", "Product"} & set(kinds):
+                continue
+
+            offer = node.get("offers") or {}
+            if isinstance(offer, list):
+                offer = offer[0] if offer else {}
+            price = offer.get("price") if isinstance(offer, dict) else None
+            # schema.org prices may carry decimals ("189900.00"), the export keeps
+            # only the digits, so cut it to whole kroner like the page's "189.900 kr."
+            try:
+                price = int(float(price)) if price is not None else None
+            except (TypeError, ValueError):
+                pass
+            if price is not None and offer.get("priceCurrency"):
+                price = f"{price} {offer['priceCurrency']}"
+            return node.get("name"), str(price) if price is not None else None
+    return None, None
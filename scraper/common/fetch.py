@@ -0,0 +1,163 @@
+"""HTTP-first fetching with a browser fallback.
+
+A detail page is first fetched with a pooled keep-alive requests session and
+extracted from the server-rendered HTML (and its JSON-LD). Only when that
+fails or misses a required field does the page go through Playwright. The
+per-site FetchStats show how often the fallback fires, and why. A 429/5xx
+or a missing listing raises HttpStatusError instead, so the engine backs
+off rather than sending the browser to a host that is pushing back.
+
+In the browser, extraction starts as soon as the page's required fields
+are present (wait_for_data) rather than after a load event; FetchStats
+keeps that time to data per page.
+"""
+import asyncio
+import time
+from collections import Counter
+from typing import Awaitable, Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.archive import HtmlArchive
+from common.extract import PageSpec, extract_html, extract_page, missing_fields, wait_for_data
+from common.ratelimit import GONE_STATUSES, RETRY_STATUSES, raise_for_status
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0.0.0 Safari/537.36"
+)
+
+# Starts navigating a pool page to the URL, returns once the response is in
+OpenPage = Callable[[object, str], Awaitable[None]]
+# Runs on a browser page once its fields are there, e.g. to dismiss a cookie banner
+PageReady = Callable[[object, str], Awaitable[None]]
+
+
+class HttpClient:
+    """requests session shared by all workers, one keep-alive pool per host."""
+
+    def __init__(self, pool_size: int = 8, timeout: float = 15.0):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml",
+            "Accept-Language": "da-DK,da;q=0.9,en;q=0.8",
+        })
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str) -> requests.Response:
+        response = self.session.get(url, timeout=self.timeout)
+        # requests assumes ISO-8859-1 for text/html without a charset, the sites are UTF-8
+        if "charset" not in response.headers.get("Content-Type", "").lower():
+            response.encoding = "utf-8"
+        return response
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class FetchStats:
+    def __init__(self, site: str):
+        self.site = site
+        self.http = 0
+        self.browser = 0
+        self.fallback_reasons: Counter = Counter()
+        # Seconds from navigation to the required fields being on the page
+        self.time_to_data: list[float] = []
+        self.data_timeouts = 0
+
+    def time_to_data_summary(self) -> str:
+        if not self.time_to_data:
+            return f"[{self.site}] no time to data, {self.data_timeouts} pages timed out"
+        times = sorted(self.time_to_data)
+        p50 = times[len(times) // 2]
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        return (
+            f"[{self.site}] time to data p50 {p50:.2f}s, p95 {p95:.2f}s over {len(times)} pages, "
+            f"{self.data_timeouts} timed out"
+        )
+
+    def summary(self) -> str:
+        total = self.http + self.browser
+        share = self.browser / total if total else 0.0
+        reasons = ", ".join(f"{reason} {n}" for reason, n in self.fallback_reasons.most_common())
+        lines = [
+            f"[{self.site}] {self.http} pages over HTTP, {self.browser} in the browser "
+            f"({share:.0%} fallback{': ' + reasons if reasons else ''})"
+        ]
+        if self.browser:
+            lines.append(self.time_to_data_summary())
+        return "\n".join(lines)
+
+
+class Fetcher:
+    """Fetches and extracts a detail page; HTTP first when given an HttpClient.
+
+    With an archive, the HTML each page was extracted from is stored in it.
+    A browser page whose required fields don't show up within wait_ms is
+    extracted as it is.
+    """
+
+    def __init__(
+        self,
+        site: str,
+        spec: PageSpec,
+        open_page: OpenPage,
+        http: HttpClient | None = None,
+        archive: HtmlArchive | None = None,
+        wait_ms: float = 10000,
+        on_ready: PageReady | None = None,
+    ):
+        self.spec = spec
+        self.open_page = open_page
+        self.http = http
+        self.archive = archive
+        self.wait_ms = wait_ms
+        self.on_ready = on_ready
+        self.stats = FetchStats(site)
+
+    async def _try_http(self, url: str) -> tuple[dict | None, str | None, str]:
+        try:
+            response = await asyncio.to_thread(self.http.get, url)
+        except requests.RequestException as e:
+            return None, None, type(e).__name__
+        if response.status_code in RETRY_STATUSES or response.status_code in GONE_STATUSES:
+            raise_for_status(url, response.status_code, response.headers)
+        if response.status_code != 200:
+            return None, None, f"http {response.status_code}"
+        html = response.text
+        data = await asyncio.to_thread(extract_html, html, self.spec)
+        missing = missing_fields(data, self.spec)
+        if missing:
+            return None, html, "missing " + "+".join(missing)
+        return data, html, ""
+
+    async def fetch(self, page, url: str) -> dict:
+        if self.http is not None:
+            data, html, reason = await self._try_http(url)
+            if data is not None:
+                self.stats.http += 1
+                if self.archive is not None:
+                    self.archive.put(url, html)
+                return data
+            self.stats.fallback_reasons[reason] += 1
+
+        started = time.perf_counter()
+        await self.open_page(page, url)
+        data = await wait_for_data(page, self.spec, self.wait_ms)
+        if data is None:
+            # Probably a listing without one of the fields, take what is there
+            self.stats.data_timeouts += 1
+            data = await extract_page(page, self.spec)
+        else:
+            self.stats.time_to_data.append(time.perf_counter() - started)
+        if self.on_ready is not None:
+            await self.on_ready(page, url)
+        self.stats.browser += 1
+        if self.archive is not None:
+            self.archive.put(url, await page.content())
+        return data
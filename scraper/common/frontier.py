@@ -0,0 +1,135 @@
+"""Persistent URL frontier for the listing scrapers.
+
+Every discovered detail URL gets a row in the frontier table of the site's
+listings DB with its status, when it was last scraped, how often it was
+tried and a hash of the extracted content. A run scrapes what is due:
+URLs never scraped (including those left pending by a crashed run), failed
+ones with attempts left, and done ones older than the refresh interval. A
+refreshed listing whose content hash didn't change isn't written again.
+URLs the engine gave up on are marked dead and copied to the dead_letters
+table with their last error; deleting the frontier row makes one due again.
+"""
+import hashlib
+import json
+import time
+
+from common.storage import BatchWriter
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+DEAD = "dead"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    url TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    discovered_at REAL NOT NULL,
+    last_scraped_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    content_hash TEXT,
+    last_error TEXT
+)
+"""
+
+DEAD_LETTERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dead_letters (
+    url TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    failed_at REAL NOT NULL
+)
+"""
+
+
+def content_hash(*parts) -> str:
+    data = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class Frontier:
+    def __init__(self, writer: BatchWriter, refresh_after: float, max_attempts: int = 3):
+        # Shares the listings' writer, so a listing and its frontier update commit together
+        self.writer = writer
+        self.conn = writer.conn
+        # Seconds after which a scraped listing is visited again
+        self.refresh_after = refresh_after
+        self.max_attempts = max_attempts
+        self.conn.execute(SCHEMA)
+        self.conn.execute(DEAD_LETTERS_SCHEMA)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_frontier_status ON frontier (status, last_scraped_at)")
+        self.conn.commit()
+
+    def add(self, urls: list[str]) -> list[str]:
+        """Add URLs not seen before, returns the new ones."""
+        now = time.time()
+        new = []
+        for url in urls:
+            cursor = self.writer.execute("INSERT OR IGNORE INTO frontier (url, discovered_at) VALUES (?, ?)", (url, now))
+            if cursor.rowcount:
+                new.append(url)
+        return new
+
+    def due(self, limit: int) -> list[str]:
+        """URLs to scrape now: never scraped first, then retries, then the stalest refreshes."""
+        stale_before = time.time() - self.refresh_after
+        rows = self.conn.execute(
+            """
+            SELECT url FROM frontier
+            WHERE status = ?
+               OR (status = ? AND attempts < ?)
+               OR (status = ? AND last_scraped_at < ?)
+            ORDER BY CASE status WHEN ? THEN 0 WHEN ? THEN 1 ELSE 2 END, last_scraped_at, discovered_at
+            LIMIT ?
+            """,
+            (PENDING, FAILED, self.max_attempts, DONE, stale_before, PENDING, FAILED, limit),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def changed(self, url: str, new_hash: str) -> bool:
+        row = self.conn.execute("SELECT content_hash FROM frontier WHERE url = ?", (url,)).fetchone()
+        return row is None or row[0] != new_hash
+
+    def mark_done(self, url: str, new_hash: str) -> None:
+        # Called after the listing is written, so a crash in between only re-scrapes it
+        self.writer.execute(
+            """
+            INSERT INTO frontier (url, status, discovered_at, last_scraped_at, attempts, content_hash)
+            VALUES (?, ?, ?, ?, 0, ?)
+            ON CONFLICT (url) DO UPDATE SET
+                status = excluded.status,
+                last_scraped_at = excluded.last_scraped_at,
+                attempts = 0,
+                content_hash = excluded.content_hash,
+                last_error = NULL
+            """,
+            (url, DONE, time.time(), time.time(), new_hash),
+        )
+
+    def mark_failed(self, url: str, error: str) -> None:
+        self.writer.execute(
+            """
+            UPDATE frontier
+            SET status = ?, attempts = attempts + 1, last_scraped_at = ?, last_error = ?
+            WHERE url = ?
+            """,
+            (FAILED, time.time(), error[:500], url),
+        )
+
+    def dead_letter(self, url: str, error: str) -> None:
+        now = time.time()
+        self.writer.execute("UPDATE frontier SET status = ?, last_error = ? WHERE url = ?", (DEAD, error[:500], url))
+        self.writer.execute(
+            """
+            INSERT INTO dead_letters (url, attempts, last_error, failed_at)
+            SELECT url, attempts, last_error, ? FROM frontier WHERE url = ?
+            ON CONFLICT (url) DO UPDATE SET
+                attempts = excluded.attempts,
+                last_error = excluded.last_error,
+                failed_at = excluded.failed_at
+            """,
+            (now, url),
+        )
+
+    def counts(self) -> dict[str, int]:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM frontier GROUP BY status").fetchall())
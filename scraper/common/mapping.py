@@ -0,0 +1,22 @@
+import json
+import os
+
+ATTRIBUTE_KEY_MAPPING_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "attribute_key_mapping_and_translation.json",
+)
+
+
+def load_attribute_key_mapping() -> tuple[dict[str, str], set[str]]:
+    with open(ATTRIBUTE_KEY_MAPPING_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    da_to_en: dict[str, str] = {}
+    for en_key, da_variants in data.items():
+        if not isinstance(en_key, str) or not isinstance(da_variants, list):
+            continue
+        for da_key in da_variants:
+            if isinstance(da_key, str) and da_key:
+                da_to_en[da_key] = en_key
+
+    return da_to_en, set(da_to_en.keys())
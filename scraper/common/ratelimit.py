@@ -0,0 +1,162 @@
+"""Adaptive per-host rate limiting and retry backoff.
+
+Every host gets a token bucket (requests per second) and a concurrency
+limit, both adjusted AIMD style: each fast successful page adds a little,
+a 429/5xx or a page slower than slow_after halves them. A Retry-After
+header also pauses the host for that long. So the scrapers speed up while
+a site keeps up and back off as soon as it pushes back.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+# Worth another try later; all but 404/410 also mean the host is struggling
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+GONE_STATUSES = {404, 410}
+
+
+class HttpStatusError(Exception):
+    def __init__(self, url: str, status: int, retry_after: float | None = None):
+        super().__init__(f"HTTP {status}")
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status in RETRY_STATUSES
+
+    @property
+    def throttled(self) -> bool:
+        return self.status == 429 or self.status >= 500
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    # Only the delta-seconds form, the HTTP-date form is rare on these sites
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+def raise_for_status(url: str, status: int, headers) -> None:
+    if status >= 400:
+        raise HttpStatusError(url, status, parse_retry_after(headers.get("retry-after")))
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: float | None = None) -> float:
+    """Exponential backoff with jitter before retry number attempt (1 for the first retry)."""
+    delay = min(cap, base * 2 ** (attempt - 1))
+    # Half fixed, half random, so retries of a burst of failures spread out
+    delay = delay / 2 + random.uniform(0, delay / 2)
+    return max(delay, retry_after or 0.0)
+
+
+@dataclass
+class RateConfig:
+    # Starting and maximum requests per second per host
+    rate: float = 2.0
+    max_rate: float = 8.0
+    min_rate: float = 0.2
+    # Requests allowed at once after an idle spell
+    burst: int = 2
+    # Starting and maximum pages on the same host at once
+    concurrency: int = 2
+    max_concurrency: int = 4
+    # A successful page slower than this counts as the host struggling
+    slow_after: float = 10.0
+    # Requests per second added per fast page
+    rate_step: float = 0.1
+    # At most one halving per cooldown, a burst of errors is one signal
+    cooldown: float = 2.0
+
+
+class HostThrottle:
+    """Token bucket plus an AIMD concurrency limit for one host."""
+
+    def __init__(self, config: RateConfig):
+        self.config = config
+        self.rate = config.rate
+        self.limit = float(config.concurrency)
+        self.tokens = float(config.burst)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.decreased_at = 0.0
+        self.updated_at = time.monotonic()
+        self.requests = 0
+        self.throttled = 0
+        self._cond = asyncio.Condition()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.config.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.in_flight < int(self.limit) and self.tokens >= 1 and now >= self.paused_until:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    self.requests += 1
+                    return
+                # Sleep until a token or the end of a pause, or until a release frees a slot
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+                timeout = wait if wait > 0 and self.in_flight < int(self.limit) else None
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _decrease(self, now: float) -> None:
+        if now - self.decreased_at < self.config.cooldown:
+            return
+        self.decreased_at = now
+        self.limit = max(1.0, self.limit / 2)
+        self.rate = max(self.config.min_rate, self.rate / 2)
+
+    def _increase(self) -> None:
+        # About +1 concurrency per limit fast pages
+        self.limit = min(self.config.max_concurrency, self.limit + 1 / self.limit)
+        self.rate = min(self.config.max_rate, self.rate + self.config.rate_step)
+
+    async def release(self, seconds: float, error: Exception | None = None) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if isinstance(error, HttpStatusError) and error.throttled:
+                self.throttled += 1
+                self._decrease(now)
+                if error.retry_after:
+                    self.paused_until = max(self.paused_until, now + error.retry_after)
+            elif error is None:
+                if seconds > self.config.slow_after:
+                    self._decrease(now)
+                else:
+                    self._increase()
+            self._cond.notify_all()
+
+    def summary(self) -> str:
+        return (
+            f"{self.requests} requests, {self.throttled} throttled, "
+            f"now {self.limit:.1f} at once and {self.rate:.2f}/s"
+        )
+
+
+class RateLimiter:
+    def __init__(self, config: RateConfig):
+        self.config = config
+        self.hosts: dict[str, HostThrottle] = {}
+
+    def __call__(self, url: str) -> HostThrottle:
+        host = urlsplit(url).netloc
+        throttle = self.hosts.get(host)
+        if throttle is None:
+            throttle = self.hosts[host] = HostThrottle(self.config)
+        return throttle
+
+    def summary(self) -> str:
+        return "\n".join(f"[{host}] {throttle.summary()}" for host, throttle in sorted(self.hosts.items()))
@@ -0,0 +1,271 @@
+"""Site-independent scraper runs: listings and attribute keys.
+
+Both page through the site's search results and feed the detail links to
+the engine's page pool as they come in (see engine.scrape). Fetching goes
+HTTP first with a browser fallback, paced per host with retries, writes are
+batched; the per-site behaviour comes from the Site adapter.
+"""
+import json
+import os
+import sqlite3
+from contextlib import aclosing
+
+from common.archive import HtmlArchive
+from common.blocking import RequestBlocker
+from common.browser import (
+    collect_detail_links,
+    go_next_page,
+    handle_cookies,
+    load_consent_state,
+    open_detail,
+    open_search,
+)
+from common.engine import PagePool, scrape
+from common.fetch import Fetcher, HttpClient
+from common.frontier import Frontier, content_hash
+from common.mapping import ATTRIBUTE_KEY_MAPPING_FILE, load_attribute_key_mapping
+from common.ratelimit import RateLimiter
+from common.site import Site
+from common.storage import BatchWriter, connect
+
+# Keep the raw HTML of every detail page (gzipped, deduplicated by content)
+# so extract_archive.py can re-extract without scraping again
+ARCHIVE_HTML = os.environ.get("SCRAPER_ARCHIVE_HTML", "0") != "0"
+
+# Try a plain HTTP GET of each detail page before opening it in the browser
+HTTP_FIRST = os.environ.get("SCRAPER_HTTP_FIRST", "1") != "0"
+
+
+def init_listings_db(path: str) -> sqlite3.Connection:
+    conn = connect(path)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS listings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            price TEXT,
+            attributes_json TEXT
+        )
+        """
+    )
+    # Databases from before the frontier have no url column
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(listings)")}
+    if "url" not in columns:
+        conn.execute("ALTER TABLE listings ADD COLUMN url TEXT")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_listings_url ON listings (url)")
+    conn.commit()
+    return conn
+
+
+def init_attribute_keys_db(path: str) -> sqlite3.Connection:
+    conn = connect(path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS attribute_keys (key_name TEXT PRIMARY KEY)"
+    )
+    conn.commit()
+    return conn
+
+
+def adopt_legacy_row(writer: BatchWriter, url: str, name, price, attrs_json: str) -> None:
+    """Give a row scraped before listings had a url this listing's url.
+
+    Matched on identical content. The upsert that follows then updates that
+    row instead of adding a second one, and it keeps the id earlier Postgres
+    exports used as source_listing_id.
+    """
+    writer.execute(
+        """
+        UPDATE listings SET url = ?
+        WHERE id = (
+            SELECT id FROM listings
+            WHERE url IS NULL AND name IS ? AND price IS ? AND attributes_json = ?
+            ORDER BY id LIMIT 1
+        )
+        AND NOT EXISTS (SELECT 1 FROM listings WHERE url = ?)
+        """,
+        (url, name, price, attrs_json, url),
+    )
+
+
+def make_fetcher(site: Site, archive: HtmlArchive | None = None, dismiss_cookies: bool = True) -> Fetcher:
+    async def open_page(page, link: str) -> None:
+        await open_detail(page, site, link)
+
+    async def dismiss(page, link: str) -> None:
+        # Rejecting once per context keeps the banner off that page's next listings
+        await handle_cookies(page, site)
+
+    http = HttpClient(pool_size=site.engine.pages) if HTTP_FIRST and site.http_first else None
+    return Fetcher(
+        site.name,
+        site.page_spec,
+        open_page,
+        http=http,
+        archive=archive,
+        wait_ms=site.detail_timeout_ms,
+        on_ready=dismiss if dismiss_cookies else None,
+    )
+
+
+async def search_links(pool: PagePool, site: Site, on_links, dismiss_cookies: bool = True):
+    """Detail links from the search pages, as each page loads.
+
+    on_links(links) returns which of them to yield (e.g. the ones not seen
+    before); paging stops after site.max_known_pages pages with none.
+    """
+    page = await (await pool.new_context()).new_page()
+    try:
+        await open_search(page, site, dismiss_cookies)
+
+        known_pages = 0
+        while True:
+            links = on_links(await collect_detail_links(page, site))
+            for link in links:
+                yield link
+
+            # Newest listings come first, pages without anything new mean we're caught up
+            known_pages = 0 if links else known_pages + 1
+            if known_pages >= site.max_known_pages:
+                break
+            if not await go_next_page(page, site):
+                break
+            if dismiss_cookies:
+                await handle_cookies(page, site)
+    finally:
+        await page.close()
+
+
+async def run_listings(site: Site) -> None:
+    # Imported here so the adapters and extract_archive.py load without a browser
+    from playwright.async_api import async_playwright
+
+    da_to_en, allowed_keys = load_attribute_key_mapping()
+    print(f"Loaded {len(allowed_keys)} attribute keys from: {ATTRIBUTE_KEY_MAPPING_FILE}")
+
+    writer = BatchWriter(init_listings_db(site.listings_db))
+    frontier = Frontier(
+        writer,
+        refresh_after=site.refresh_after_days * 24 * 3600,
+        max_attempts=site.engine.max_attempts,
+    )
+
+    blocker = RequestBlocker(site.fetch_profile)
+    limiter = RateLimiter(site.engine.rate)
+    archive = HtmlArchive(site.archive_dir) if ARCHIVE_HTML else None
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=site.fetch_profile.headless)
+        # Contexts start with the banner already dismissed, pages don't look for it
+        consent = await load_consent_state(browser, site, blocker)
+        pool = PagePool(browser, site.engine.pages, blocker=blocker, storage_state=consent)
+        fetcher = make_fetcher(site, archive, dismiss_cookies=consent is None)
+        new_links: list[str] = []
+
+        def add_new(links: list[str]) -> list[str]:
+            added = frontier.add(links)
+            new_links.extend(added)
+            return added
+
+        async def discover():
+            # Work left from earlier runs first, then new links as each search page loads
+            for link in frontier.due(site.target_links):
+                yield link
+            # Closed explicitly, so a stopped crawl also releases the search page
+            async with aclosing(search_links(pool, site, add_new, dismiss_cookies=consent is None)) as links:
+                async for link in links:
+                    yield link
+
+        async def visit(page, link: str) -> None:
+            try:
+                data = await fetcher.fetch(page, link)
+                name, price, attrs = site.parse_listing(data, allowed_keys)
+                attrs_en = site.translate_attributes(attrs, da_to_en)
+            except Exception as e:
+                frontier.mark_failed(link, str(e))
+                raise
+
+            new_hash = content_hash(name, price, attrs_en)
+            if frontier.changed(link, new_hash):
+                attrs_json = json.dumps(attrs_en, ensure_ascii=False)
+                adopt_legacy_row(writer, link, name, price, attrs_json)
+                writer.execute(
+                    """
+                    INSERT INTO listings (url, name, price, attributes_json) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (url) DO UPDATE SET
+                        name = excluded.name,
+                        price = excluded.price,
+                        attributes_json = excluded.attributes_json
+                    """,
+                    (link, name, price, attrs_json),
+                )
+            frontier.mark_done(link, new_hash)
+
+        def give_up(link: str, error: Exception) -> None:
+            frontier.dead_letter(link, str(error))
+
+        print(f"Scraping up to {site.target_links} detail pages on {site.engine.pages} pages while paging the search...")
+        try:
+            async with pool:
+                stats = await scrape(
+                    pool, discover(), visit, site.engine,
+                    limit=site.target_links, limiter=limiter, on_give_up=give_up,
+                )
+        finally:
+            writer.flush()
+
+        await browser.close()
+
+    if fetcher.http is not None:
+        fetcher.http.close()
+    print(f"Found {len(new_links)} new detail links")
+    print(stats.summary())
+    print(fetcher.stats.summary())
+    print(f"Frontier: {frontier.counts()}")
+    print(limiter.summary())
+    print(blocker.summary())
+    print(f"Committed in {writer.commits} transactions")
+    writer.close()
+    print(f"Saved listings to: {site.listings_db}")
+
+
+async def run_attribute_keys(site: Site) -> None:
+    from playwright.async_api import async_playwright
+
+    writer = BatchWriter(init_attribute_keys_db(site.attribute_keys_db))
+    blocker = RequestBlocker(site.fetch_profile)
+    limiter = RateLimiter(site.engine.rate)
+    unique_keys: set[str] = set()
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=site.fetch_profile.headless)
+        consent = await load_consent_state(browser, site, blocker)
+        pool = PagePool(browser, site.engine.pages, blocker=blocker, storage_state=consent)
+        fetcher = make_fetcher(site, dismiss_cookies=consent is None)
+
+        async def visit(page, link: str) -> None:
+            data = await fetcher.fetch(page, link)
+            for key in site.attribute_keys(data):
+                if key in unique_keys:
+                    continue
+                unique_keys.add(key)
+                writer.execute(
+                    "INSERT OR IGNORE INTO attribute_keys (key_name) VALUES (?)",
+                    (key,),
+                )
+
+        try:
+            async with pool:
+                links = search_links(pool, site, lambda links: links, dismiss_cookies=consent is None)
+                stats = await scrape(pool, links, visit, site.engine, limit=site.target_links, limiter=limiter)
+        finally:
+            writer.flush()
+
+        await browser.close()
+
+    if fetcher.http is not None:
+        fetcher.http.close()
+    print(stats.summary())
+    print(fetcher.stats.summary())
+    print(limiter.summary())
+    writer.close()
+    print(f"Saved {len(unique_keys)} unique attribute keys to: {site.attribute_keys_db}")
@@ -0,0 +1,102 @@
+"""Declarative site adapters.
+
+A Site holds everything that differs between marketplaces: URLs, search
+page selectors, the detail PageSpec and the functions turning extracted
+data into listing attributes. common/runner.py does the rest. Adding a
+marketplace means writing <site>/site.py and listing it in SITES.
+"""
+import importlib
+import os
+from dataclasses import dataclass, field
+from typing import Callable
+
+from common.blocking import FetchProfile
+from common.engine import EngineConfig
+from common.extract import PageSpec
+
+# Site name -> module defining SITE
+SITES = {
+    "bilbasen": "bilbasen.site",
+    "dba": "dba.site",
+}
+
+COOKIE_MODAL_SELECTOR = "div.message.type-modal"
+COOKIE_REJECT_SELECTORS = (
+    "button.sp_choice_type_REJECT_ALL",
+    "button:has-text('Afvis alle')",
+    "button:has-text('Kun nødvendige')",
+    "button:has-text('Nødvendige')",
+    "button:has-text('Afvis')",
+    "button:has-text('Reject all')",
+    "button:has-text('Reject')",
+    "button:has-text('Decline')",
+)
+
+# (extracted data, allowed keys) -> (name, price, attributes with Danish keys)
+ParseListing = Callable[[dict, set[str]], tuple[str | None, str | None, dict]]
+# (attributes with Danish keys, Danish -> English key mapping) -> English attributes
+TranslateAttributes = Callable[[dict, dict[str, str]], dict]
+# extracted data -> attribute keys seen on the page
+AttributeKeys = Callable[[dict], set[str]]
+
+
+@dataclass(frozen=True)
+class Site:
+    name: str
+    base_url: str
+    start_url: str
+
+    # Search results
+    listing_card_selector: str
+    listing_link_selector: str
+    next_page_selector: str
+
+    # Detail pages
+    page_spec: PageSpec
+    parse_listing: ParseListing
+    translate_attributes: TranslateAttributes
+    attribute_keys: AttributeKeys
+
+    # Output databases, the HTML archive and consent state go next to the listings DB
+    listings_db: str
+    attribute_keys_db: str
+
+    fetch_profile: FetchProfile = field(default_factory=FetchProfile)
+    # Try detail pages over plain HTTP before the browser. Off for sites whose
+    # PageSpec needs the browser, e.g. price_must_be_visible: offline extraction
+    # can't see what the site's CSS hides and would take a hidden price
+    http_first: bool = True
+    engine: EngineConfig = field(default_factory=EngineConfig)
+
+    cookie_modal_selector: str = COOKIE_MODAL_SELECTOR
+    cookie_reject_selectors: tuple[str, ...] = COOKIE_REJECT_SELECTORS
+    # How long to wait for the banner when saving the consent state, and when to renew it
+    consent_timeout_ms: int = 10000
+    consent_max_age_days: float = 30
+
+    # How long pages get to show what is read from them: the listing cards
+    # of a search page, the PageSpec's required fields of a detail page
+    search_timeout_ms: int = 15000
+    detail_timeout_ms: int = 10000
+
+    # Detail pages per run
+    target_links: int = 100
+    # Listings scraped more than this long ago are visited again
+    refresh_after_days: float = 7
+    # Stop paging the search once this many pages in a row had no new links
+    max_known_pages: int = 3
+
+    @property
+    def archive_dir(self) -> str:
+        return os.path.join(os.path.dirname(self.listings_db), "html_archive")
+
+    @property
+    def storage_state_file(self) -> str:
+        return os.path.join(os.path.dirname(self.listings_db), "storage_state.json")
+
+    def absolute_url(self, href: str) -> str:
+        return self.base_url + href if href.startswith("/") else href
+
+
+def load_site(name: str) -> Site:
+    return importlib.import_module(SITES[name]).SITE
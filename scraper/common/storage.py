@@ -0,0 +1,70 @@
+"""SQLite storage for the scrapers: WAL mode and batched commits.
+
+connect() opens a database in WAL mode with synchronous=NORMAL, so a commit
+appends to the log instead of syncing the whole database, and readers
+don't block the writer. BatchWriter groups writes into one transaction per
+max_rows rows or max_seconds, whichever comes first; a crash loses at most
+the batch that was still open.
+"""
+import sqlite3
+import time
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    # Durable across application crashes in WAL mode, fsyncs only at checkpoints
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-32000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class BatchWriter:
+    def __init__(self, conn: sqlite3.Connection, max_rows: int = 100, max_seconds: float = 5.0):
+        self.conn = conn
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.pending = 0
+        self.commits = 0
+        self._batch_started: float | None = None
+
+    def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        cursor = self.conn.execute(sql, params)
+        self._written(1)
+        return cursor
+
+    def executemany(self, sql: str, rows: list) -> sqlite3.Cursor:
+        cursor = self.conn.executemany(sql, rows)
+        self._written(len(rows))
+        return cursor
+
+    def _written(self, rows: int) -> None:
+        if self._batch_started is None:
+            self._batch_started = time.monotonic()
+        self.pending += rows
+        if self.pending >= self.max_rows or time.monotonic() - self._batch_started >= self.max_seconds:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.pending:
+            self.conn.commit()
+            self.commits += 1
+        self.pending = 0
+        self._batch_started = None
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self) -> "BatchWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
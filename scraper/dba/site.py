@@ -0,0 +1,90 @@
+import os
+
+from common.blocking import FetchProfile
+from common.engine import EngineConfig
+from common.extract import PageSpec
+from common.ratelimit import RateConfig
+from common.site import Site
+
+SITE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+NAME_SELECTOR = "h1.t1"
+PRICE_SELECTORS = (
+    "h2 span.t2",
+    "span.t2",
+    "span.t3.font-bold",
+)
+SPEC_ROW_SELECTOR = "section.key-info-section dl div"
+
+OMIT_KEYS = {
+    "Registreringsnummer",
+    "Stelnummer",
+    "VIN nummer",
+    "VIN-nummer",
+    "VIN",
+}
+
+PAGE_SPEC = PageSpec(
+    name_selectors=(NAME_SELECTOR,),
+    price_selectors=PRICE_SELECTORS,
+    row_selector=SPEC_ROW_SELECTOR,
+    row_key_selector="dt",
+    row_value_selector="dd",
+    price_must_be_visible=True,
+)
+
+
+def parse_listing(data: dict, allowed_keys: set[str]) -> tuple[str | None, str | None, dict[str, str]]:
+    name = data["name"].replace("\n", " ") if data["name"] else None
+    price = data["price"]
+
+    attrs: dict[str, str] = {}
+    for k, v in data["rows"]:
+        if not k or k in OMIT_KEYS:
+            continue
+        if k not in allowed_keys:
+            continue
+        if v:
+            attrs[k] = v
+
+    return name, price, attrs
+
+
+def translate_attributes(attrs: dict[str, str], da_to_en: dict[str, str]) -> dict[str, str]:
+    translated: dict[str, str] = {}
+
+    for da_key, value in attrs.items():
+        en_key = da_to_en.get(da_key)
+        if not en_key:
+            continue
+        translated[en_key] = value
+
+    return translated
+
+
+def attribute_keys(data: dict) -> set[str]:
+    return {k for k, _ in data["rows"] if k and k not in OMIT_KEYS}
+
+
+SITE = Site(
+    name="dba",
+    base_url="https://www.dba.dk",
+    start_url="https://www.dba.dk/mobility/search/car?registration_class=1",
+    listing_card_selector="article.mobility-search-ad-card",
+    listing_link_selector="a.sf-search-ad-link",
+    next_page_selector="a:has(span.sr-only:has-text('Næste side'))",
+    page_spec=PAGE_SPEC,
+    parse_listing=parse_listing,
+    translate_attributes=translate_attributes,
+    attribute_keys=attribute_keys,
+    listings_db=os.path.join(SITE_DIR, "dba_listings.db"),
+    attribute_keys_db=os.path.join(SITE_DIR, "dba_attribute_keys.db"),
+    # Headless, without images/fonts/trackers. Stylesheets stay: the price is
+    # read from the first *visible* price element, which needs the site's CSS
+    fetch_profile=FetchProfile(allow_types=frozenset({"stylesheet"})),
+    # For the same reason the price can't be read from the raw HTML
+    http_first=False,
+    engine=EngineConfig(pages=4, rate=RateConfig(concurrency=2, max_concurrency=4)),
+    # The price is read once visible, which takes the stylesheets loaded
+    detail_timeout_ms=12000,
+)
@@ -85,15 +85,46 @@ def _read_text(path: str) -> str:
         return f.read()
 
 
-def _read_listings(db_path: str) -> list[tuple[int, str | None, str | None, str | None]]:
+def _read_listings(db_path: str) -> list[tuple[int, str | None, str | None, str | None, str | None]]:
     conn = sqlite3.connect(db_path)
     try:
-        rows = conn.execute("SELECT id, name, price, attributes_json FROM listings").fetchall()
-        return [(int(r[0]), r[1], r[2], r[3]) for r in rows]
+        # url was added with the scraper frontier, older databases don't have it
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(listings)")}
+        url_col = "url" if "url" in columns else "NULL"
+        rows = conn.execute(f"SELECT id, name, price, attributes_json, {url_col} FROM listings ORDER BY id").fetchall()
+        return _merge_legacy_rows([(int(r[0]), r[1], r[2], r[3], r[4]) for r in rows])
     finally:
         conn.close()
 
 
+def _merge_legacy_rows(
+    rows: list[tuple[int, str | None, str | None, str | None, str | None]],
+) -> list[tuple[int, str | None, str | None, str | None, str | None]]:
+    """Collapse a row scraped without a url and its re-scrape with one.
+
+    Rows from before the url column can't be matched by url, so they are
+    matched on identical content (name, price, attributes). The pair is
+    exported once: under the old row's id, the natural key earlier exports
+    used, with the new row's url.
+    """
+    by_content: dict[tuple, int] = {}
+    for i, (_, name, price, attributes_json, url) in enumerate(rows):
+        if url is None:
+            by_content.setdefault((name, price, attributes_json), i)
+
+    merged = list(rows)
+    dropped: set[int] = set()
+    for i, (_, name, price, attributes_json, url) in enumerate(rows):
+        if url is None:
+            continue
+        legacy = by_content.pop((name, price, attributes_json), None)
+        if legacy is None:
+            continue
+        merged[legacy] = rows[legacy][:4] + (url,)
+        dropped.add(i)
+    return [row for i, row in enumerate(merged) if i not in dropped]
+
+
 def _load_attrs(attributes_json: str | None) -> dict[str, Any]:
     if not attributes_json:
         return {}
@@ -249,8 +280,8 @@ def export() -> None:
         if not os.path.exists(db_path):
             raise FileNotFoundError(f"Missing source database: {db_path}")
 
-        for listing_id, name, price_text, attributes_json in _read_listings(db_path):
-            row = {"id": listing_id, "name": name, "price": price_text, "attributes_json": attributes_json}
+        for listing_id, name, price_text, attributes_json, url in _read_listings(db_path):
+            row = {"id": listing_id, "name": name, "price": price_text, "attributes_json": attributes_json, "url": url}
             attrs = _load_attrs(attributes_json)
 
             dim_values: dict[str, str | None] = {}
@@ -0,0 +1,98 @@
+"""Re-extract archived detail pages offline, without a browser.
+
+    SCRAPER_ARCHIVE_HTML=1 python scrape.py bilbasen listings
+    python extract_archive.py bilbasen --workers 8
+
+Parses the newest archived HTML of every URL with the site adapter's
+page_spec and attribute mapping across a process pool, and writes the results to
+<site>/<site>_listings_offline.db (same listings columns plus url and the
+page's sha256). Use it after changing the selectors or the mapping instead
+of scraping again.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from common.archive import HtmlArchive
+from common.extract import extract_html
+from common.mapping import load_attribute_key_mapping
+from common.site import SITES, Site, load_site
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_site: Site | None = None
+_archive: HtmlArchive | None = None
+_da_to_en: dict[str, str] = {}
+_allowed_keys: set[str] = set()
+
+
+def _init_worker(site: str) -> None:
+    global _site, _archive, _da_to_en, _allowed_keys
+    _site = load_site(site)
+    _archive = HtmlArchive(_site.archive_dir)
+    _da_to_en, _allowed_keys = load_attribute_key_mapping()
+
+
+def _extract(entry: dict) -> tuple:
+    data = extract_html(_archive.get(entry["sha256"]), _site.page_spec)
+    name, price, attrs = _site.parse_listing(data, _allowed_keys)
+    attrs_en = _site.translate_attributes(attrs, _da_to_en)
+    return entry["url"], entry["sha256"], name, price, json.dumps(attrs_en, ensure_ascii=False)
+
+
+def init_out_db(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TABLE IF EXISTS listings")
+    conn.execute(
+        """
+        CREATE TABLE listings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT,
+            html_sha256 TEXT,
+            name TEXT,
+            price TEXT,
+            attributes_json TEXT
+        )
+        """
+    )
+    conn.commit()
+    return conn
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-extract archived detail pages")
+    parser.add_argument("site", choices=sorted(SITES))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", help="Output SQLite file (default <site>/<site>_listings_offline.db)")
+    args = parser.parse_args()
+
+    site = load_site(args.site)
+    entries = list(HtmlArchive(site.archive_dir).latest())
+    if not entries:
+        raise SystemExit(f"No archived pages in {site.archive_dir}, scrape with SCRAPER_ARCHIVE_HTML=1 first")
+
+    if site.page_spec.price_must_be_visible:
+        print(f"WARNING: {args.site} reads the visible price, offline only inline-hidden prices are skipped")
+
+    out_file = args.out or os.path.join(ROOT_DIR, args.site, f"{args.site}_listings_offline.db")
+    conn = init_out_db(out_file)
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(args.site,)) as pool:
+        rows = list(pool.map(_extract, entries, chunksize=max(1, len(entries) // (args.workers * 4))))
+    conn.executemany(
+        "INSERT INTO listings (url, html_sha256, name, price, attributes_json) VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Extracted {len(rows)} pages in {elapsed:.1f}s with {args.workers} workers, saved to: {out_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Run a scraper for one of the sites in common/site.py.
+
+    python scrape.py bilbasen listings
+    python scrape.py dba attribute-keys
+"""
+import argparse
+import asyncio
+
+from common.runner import run_attribute_keys, run_listings
+from common.site import SITES, load_site
+
+COMMANDS = {
+    "listings": run_listings,
+    "attribute-keys": run_attribute_keys,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Scrape car listings")
+    parser.add_argument("site", choices=sorted(SITES))
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+
+    asyncio.run(COMMANDS[args.command](load_site(args.site)))
+
+
+if __name__ == "__main__":
+    main()
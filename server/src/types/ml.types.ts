@@ -47,5 +47,49 @@ export interface ValidationResult {
 export interface PredictionResponse {
   predicted_price: number;
   confidence?: number;
+  // Price band from the model's quantile boosters, when it has them
+  price_low?: number | null;
+  price_high?: number | null;
+  interval_quantiles?: number[] | null;
+  model_version?: string;
+}
+
+export interface BatchPredictionItem {
+  predicted_price: number | null;
+  price_low?: number | null;
+  price_high?: number | null;
+  error: string | null;
+}
+
+export interface BatchPredictionResponse {
+  predictions: BatchPredictionItem[];
+  interval_quantiles?: number[] | null;
+  model_version?: string;
+}
+
+// Raw Car record fields accepted by the ML service listings endpoints
+export interface RawListing {
+  // Required by the ML service, listings without them are rejected
+  make: string;
+  name: string;
+  model_year: number;
+  mileage: number | null; // km
+  fuel_consumption: string | null;
+  power: string | null;
+  engine_displacement: string | null;
+  transmission_type_id: number | null;
+  drivetrain_id: number | null;
+  fuel_type: string | null;
+  color: string | null;
+  number_of_owners: number | null;
+}
+
+export interface ListingPredictionItem extends BatchPredictionItem {
+  features: Omit<MLModelInput, 'danish_market'> | null;
+}
+
+export interface ListingPredictionResponse {
+  predictions: ListingPredictionItem[];
+  interval_quantiles?: number[] | null;
   model_version?: string;
 }